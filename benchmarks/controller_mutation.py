@@ -0,0 +1,75 @@
+import sys
+import os
+import time
+import random
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from robot.individual import Individual
+from controllers.coupled_oscillator import CoupledOscillator
+
+
+def population(n: int, seed: int) -> list[Individual]:
+    random.seed(seed)
+    return [Individual(CoupledOscillator, create_simple=False) for _ in range(n)]
+
+
+def parameters(individuals: list[Individual]) -> np.ndarray:
+    return np.array([module.controller.get_parameters() for ind in individuals for module in ind.modules])
+
+
+def per_object(individuals: list[Individual], mutation_rate: float, mutation_sigma: float):
+    for ind in individuals:
+        ind.mutate_controller(mutation_rate, mutation_sigma)
+
+
+def batched(individuals: list[Individual], mutation_rate: float, mutation_sigma: float):
+    Individual.mutate_controllers(individuals, mutation_rate, mutation_sigma)
+
+
+def time_mutation(mutate, individuals: list[Individual], repeats: int, mutation_rate: float,
+                  mutation_sigma: float) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        mutate(individuals, mutation_rate, mutation_sigma)
+    return (time.perf_counter() - start) / repeats
+
+
+def distribution(mutate, args) -> np.ndarray:
+    # Changes of the parameters after one mutation of the same population, many times
+    changes = []
+    for repeat in range(args.distribution_repeats):
+        individuals = population(args.population_size, args.seed)
+        before = parameters(individuals)
+        random.seed(repeat)
+        np.random.seed(repeat)
+        mutate(individuals, args.mutation_rate, args.mutation_sigma)
+        changes.append(parameters(individuals) - before)
+    return np.concatenate(changes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-object against batched controller mutation")
+    parser.add_argument("--population-size", type=int, default=100)
+    parser.add_argument("--mutation-rate", type=float, default=0.3)
+    parser.add_argument("--mutation-sigma", type=float, default=0.2)
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--distribution-repeats", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    individuals = population(args.population_size, args.seed)
+    modules = sum(len(ind.modules) for ind in individuals)
+    print(f"{args.population_size} individuals, {modules} controllers")
+    for name, mutate in (("per object", per_object), ("batched", batched)):
+        seconds = time_mutation(mutate, individuals, args.repeats, args.mutation_rate, args.mutation_sigma)
+        print(f"{name:>10}: {seconds * 1000:.2f} ms per generation")
+
+    print("Distribution of the parameter changes (share mutated, mean, std, 5% and 95% quantile of mutated):")
+    for name, mutate in (("per object", per_object), ("batched", batched)):
+        changes = distribution(mutate, args)
+        for i, parameter in enumerate(CoupledOscillator.PARAMETERS):
+            mutated = changes[:, i][changes[:, i] != 0]
+            print(f"{name:>10} {parameter:>12}: {len(mutated) / len(changes):.3f} {mutated.mean():+.4f} "
+                  f"{mutated.std():.4f} {np.quantile(mutated, 0.05):+.4f} {np.quantile(mutated, 0.95):+.4f}")
@@ -0,0 +1,74 @@
+import sys
+import os
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+from run_config import RunConfig
+from robot.individual import Individual
+from controllers.coupled_oscillator import CoupledOscillator
+from evaluation.evaluator import Evaluator
+from evolutionary_algorithms.only_controller import EA
+from evolutionary_algorithms.ask_tell import AskTell
+from evolutionary_algorithms.optimizers import ControllerSpace
+
+
+def synthetic_fitness(evaluator: Evaluator, ind: Individual, **kwargs) -> float:
+    # Stand-in for unity with a known optimum, to compare the optimizers without simulating
+    space = ControllerSpace(ind)
+    target = np.random.default_rng(0).random(space.dimensions)
+    difference = space.to_vector(ind) - target
+    difference = np.where(space.periodic, (difference + 0.5) % 1.0 - 0.5, difference)
+    return np.round(10 * np.exp(-np.sum(difference ** 2)), 3)
+
+
+def evaluations_to_target(ea: EA, population_size: int, target: float, max_evaluations: int,
+                          elitism: int = 0) -> int:
+    # Evaluations until the best fitness reaches target, None if it is not reached within max_evaluations
+    ea.reset(population_size)
+    ea.elitism = elitism
+    evaluations = len(ea.population)
+    while ea.hall_of_fame[0].fitness < target and evaluations < max_evaluations and not ea.interrupted:
+        ea.step(elitism)
+        evaluations += len(ea.population)
+    return evaluations if ea.hall_of_fame[0].fitness >= target else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluations to a target fitness of the EA and the ask/tell "
+                                                 "controller optimizers on a fixed morphology")
+    parser.add_argument("--robot", default="robot/robot_configurations/four_legged.json")
+    parser.add_argument("--target", type=float, default=None, help="Default 5.0 with --synthetic")
+    parser.add_argument("--synthetic", action="store_true", help="Use a synthetic fitness instead of unity")
+    parser.add_argument("--terrain", default=None)
+    parser.add_argument("--parallel-processes", type=int, default=8)
+    parser.add_argument("--population-size", type=int, default=None, help="Default the number of processes")
+    parser.add_argument("--max-evaluations", type=int, default=2000)
+    parser.add_argument("--eval-steps", type=int, default=config.EVALUATION_STEPS)
+    parser.add_argument("--seeds", type=int, default=5)
+    parser.add_argument("--methods", nargs="+", default=["ea", "cmaes", "bayesian"])
+    args = parser.parse_args()
+    if args.target is None and not args.synthetic:
+        parser.error("--target is needed when evaluating in unity")
+    target = args.target if args.target is not None else 5.0
+    population_size = args.population_size or args.parallel_processes
+    evaluation_func = synthetic_fitness if args.synthetic else Evaluator.evaluate
+
+    for method in args.methods:
+        if method == "ea":
+            ea = EA(evaluation_func, CoupledOscillator, mutation_rate=0.3, mutation_sigma=0.2,
+                    robot_config_path=args.robot, parallel_processes=args.parallel_processes)
+        else:
+            ea = AskTell(evaluation_func, CoupledOscillator, args.robot, optimizer=method,
+                         parallel_processes=args.parallel_processes)
+        results = []
+        for seed in range(args.seeds):
+            ea.run_config = RunConfig(terrain=args.terrain, eval_steps=args.eval_steps, seed=seed)
+            results.append(evaluations_to_target(ea, population_size, target, args.max_evaluations,
+                                                 elitism=1 if method == "ea" else 0))
+        ea.pool.close()
+        reached = [evaluations for evaluations in results if evaluations is not None]
+        median = f"{np.median(reached):.0f}" if len(reached) > 0 else "-"
+        print(f"{method:>9}: reached {target} in {len(reached)}/{args.seeds} runs, "
+              f"median {median} evaluations ({results})")
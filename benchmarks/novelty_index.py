@@ -0,0 +1,43 @@
+import sys
+import os
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+from evolutionary_algorithms.novelty import BehaviourIndex
+
+
+def brute_force(archive: np.ndarray, behaviours: np.ndarray, k: int) -> np.ndarray:
+    distances = np.linalg.norm(behaviours[:, None, :] - archive[None, :, :], axis=2)
+    return np.sort(distances, axis=1)[:, :k]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Novelty queries of one generation against a growing archive")
+    parser.add_argument("--archive-sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--population-size", type=int, default=100)
+    parser.add_argument("--k", type=int, default=15)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    index = BehaviourIndex()
+    added_seconds = 0.0
+    for size in sorted(args.archive_sizes):
+        # Grows one generation at a time like a run, so rebuilds are included in the adding time
+        while len(index) < size:
+            start = time.perf_counter()
+            index.add(rng.normal(size=(args.population_size, config.BEHAVIOUR_SAMPLES)).cumsum(axis=1))
+            added_seconds += time.perf_counter() - start
+        population = rng.normal(size=(args.population_size, config.BEHAVIOUR_SAMPLES)).cumsum(axis=1)
+        start = time.perf_counter()
+        nearest = index.nearest(population, args.k)
+        query_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        expected = brute_force(index.behaviours[:len(index)], population, args.k)
+        brute_seconds = time.perf_counter() - start
+        print(f"{len(index):>7} behaviours: query {query_seconds * 1000:.2f} ms, "
+              f"brute force {brute_seconds * 1000:.1f} ms, "
+              f"adding so far {added_seconds:.2f} s in {index.rebuilds} rebuilds, same neighbours: {np.allclose(nearest, expected)}")
@@ -0,0 +1,60 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Modules a worker should never import, they are only used for plotting, evolution or progress bars
+HEAVY_MODULES = ["matplotlib", "seaborn", "deap", "tqdm", "bayes_opt", "evolutionary_algorithms", "storage"]
+
+CHILD = """
+import os, sys, json, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+with open("/proc/self/statm") as file:
+    rss_mb = int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+heavy = sorted(name for name in {heavy} if name in sys.modules)
+print(json.dumps({{"import_seconds": seconds, "rss_mb": rss_mb, "heavy": heavy}}))
+"""
+
+
+def measure(module: str) -> dict:
+    # Start-up of a fresh interpreter that imports module, like a newly spawned worker
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", CHILD.format(module=module, heavy=HEAVY_MODULES)],
+                            cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    result = json.loads(output)
+    result["startup_seconds"] = time.perf_counter() - start
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Start-up time and memory of a worker process")
+    parser.add_argument("--modules", nargs="+", default=["evaluation.worker", "evaluation.evaluator", "evolve"])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--budget-seconds", type=float, default=1.0, help="Start-up budget of evaluation.worker")
+    parser.add_argument("--budget-mb", type=float, default=60.0, help="RSS budget of evaluation.worker")
+    args = parser.parse_args()
+
+    over_budget = False
+    for module in args.modules:
+        try:
+            results = [measure(module) for _ in range(args.repeats)]
+        except subprocess.CalledProcessError as e:
+            print(f"{module:>22}: could not be imported ({e.stderr.strip().splitlines()[-1]})")
+            continue
+        startup = min(r["startup_seconds"] for r in results)
+        imports = min(r["import_seconds"] for r in results)
+        rss = min(r["rss_mb"] for r in results)
+        heavy = results[0]["heavy"]
+        print(f"{module:>22}: start-up {startup:.3f} s, imports {imports:.3f} s, RSS {rss:.1f} MB"
+              + (f", heavy modules: {', '.join(heavy)}" if heavy else ""))
+        if module == "evaluation.worker":
+            over_budget = startup > args.budget_seconds or rss > args.budget_mb or len(heavy) > 0
+    if over_budget:
+        print(f"evaluation.worker is over the budget of {args.budget_seconds} s and {args.budget_mb} MB "
+              f"or imports heavy modules")
+        sys.exit(1)
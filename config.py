@@ -33,3 +33,13 @@ ROTATIONS = [0, 90, 180, 270]
 CLEAN_UP_GENOMES = True
 MAX_ADD_DEPTH = 6
 REPEAT_ADD_PROB = 0.5
+COLLISION_PRECHECK = True  # Checks new and swapped modules for placements unity would skip, see robot/occupancy.py
+CREATE_ADD_ATTEMPTS = 100  # add_module calls when creating a random robot, fewer modules if they keep failing
+SWAP_ATTEMPTS = 4
+SIMULATOR_VERSION = "1"  # Change when the unity builds change, archived fitnesses of other versions are not reused
+BEHAVIOUR_SAMPLES = 8  # Points of the fitness trace kept as behaviour descriptor of an evaluation, for novelty search
+
+MAX_ENVS_PER_EVALUATOR = 2  # Unity players kept per evaluator, within the pool's limit of live envs (its size)
+AUTOTUNE_PROCESSES = False  # parallel_processes in evolve.py is then the maximum number of unity instances
+METRICS_PORT = None  # Port of the prometheus endpoint of evolve.py, e.g. 9100
+METRICS_HOST = "127.0.0.1"  # Interface it listens on, "0.0.0.0" exposes it to other machines
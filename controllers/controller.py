@@ -2,6 +2,9 @@ from abc import ABC, abstractmethod
 
 
 class Controller(ABC):
+    PARAMETERS = ()  # Names of the evolved parameters
+    PERIODIC = ()  # Parameters that wrap around their allowable range instead of being clipped
+
     def __init__(self, node_id, parent, init: bool = False):
         self.node_id = node_id
         self.parent = parent
@@ -17,3 +20,16 @@ class Controller(ABC):
     @abstractmethod
     def mutate(self, mutation_rate: float, mutation_sigma: float):
         pass
+
+    @classmethod
+    def mutate_batch(cls, controllers: list, mutation_rate: float, mutation_sigma: float):
+        # Mutates many controllers of this class at once, controllers without a vectorised version do it one by one
+        for controller in controllers:
+            controller.mutate(mutation_rate, mutation_sigma)
+
+    def get_parameters(self) -> list[float]:
+        return [getattr(self, name) for name in self.PARAMETERS]
+
+    def set_parameters(self, parameters):
+        for name, value in zip(self.PARAMETERS, parameters):
+            setattr(self, name, value)
@@ -6,6 +6,8 @@ from controllers.controller import Controller
 
 
 class CoupledOscillator(Controller):
+    PARAMETERS = ("amp", "phase_offset", "offset")
+    PERIODIC = ("phase_offset",)
     allowable_amp = (0.0, 2.0)
     allowable_phase_offset = (-np.pi, np.pi)
     allowable_offset = (-1.0, 1.0)
@@ -53,6 +55,27 @@ class CoupledOscillator(Controller):
             scaled_sigma = mutation_sigma * (CoupledOscillator.allowable_offset[1] - CoupledOscillator.allowable_offset[0])
             self.offset = np.clip(random.gauss(self.offset, scaled_sigma), *CoupledOscillator.allowable_offset)
 
+    @classmethod
+    def mutate_batch(cls, controllers: list, mutation_rate: float, mutation_sigma: float):
+        # Same distribution as mutate, with np.random instead of random, for all controllers in a few array operations
+        if len(controllers) == 0:
+            return
+        parameters = np.array([(c.amp, c.phase_offset, c.offset) for c in controllers], dtype=np.float64)
+        bounds = np.array([cls.allowable_amp, cls.allowable_phase_offset, cls.allowable_offset])
+        low, high = bounds[:, 0], bounds[:, 1]
+        mutated = np.random.random_sample(parameters.shape) < mutation_rate
+        noise = np.random.standard_normal(parameters.shape) * (mutation_sigma * (high - low))
+        new = parameters + noise
+        new[:, 0] = np.clip(new[:, 0], low[0], high[0])
+        new[:, 2] = np.clip(new[:, 2], low[2], high[2])
+        phase = new[:, 1]  # Wraps around once, like mutate
+        new[:, 1] = np.where(phase < low[1], high[1] + (phase - low[1]),
+                             np.where(phase > high[1], low[1] + (phase - high[1]), phase))
+        parameters = np.where(mutated, new, parameters)
+        for i in np.flatnonzero(mutated.any(axis=1)).tolist():
+            controller = controllers[i]
+            controller.amp, controller.phase_offset, controller.offset = parameters[i].tolist()
+
     def __str__(self):
         string = "Amp:".ljust(10, " ") + f"{round(self.amp, 2)}\n"
         string += "Freq:".ljust(10, " ") + f"{round(self.freq, 2)}\n"
@@ -1,5 +1,4 @@
 import math
-import matplotlib.pyplot as plt
 import numpy as np
 import random
 import config
@@ -7,6 +6,7 @@ from controllers.controller import Controller
 
 
 class SineController(Controller):
+    PARAMETERS = ("amp", "phase", "offset")
     # TODO: Tune this
     allowable_amp = (0.0, 3.0)
     # allowable_freq = (0.0, 2.5)
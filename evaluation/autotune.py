@@ -0,0 +1,81 @@
+class PoolAutotuner:
+    # Finds how many evaluators of a pool should run at once. Too many unity instances on one node makes every
+    # env.step() slower, so the number of live environments is ramped up (or down) while throughput improves,
+    # then kept, and searched again if throughput degrades.
+    def __init__(self, pool, start: int = None, factor: int = 2, tolerance: float = 0.05,
+                 degradation: float = 0.2, smoothing: float = 0.3):
+        self.pool = pool
+        self.factor = factor
+        self.tolerance = tolerance  # Relative improvement needed to keep ramping
+        self.degradation = degradation  # Relative drop of the settled throughput that starts a new search
+        self.smoothing = smoothing
+        self.measured = {}  # Live environments -> throughput (simulated steps per second)
+        self.state = "up"
+        self.best = None
+        self.settled_throughput = None
+        self.history = []  # (live environments, evaluations/s, seconds per step) of every measurement
+        self.start = min(start if start is not None else max(1, pool.size // 4), pool.size)
+        self.set_active(self.start)
+        self.last_totals = self.totals()
+
+    def totals(self) -> tuple:
+        stats = [evaluator.stats for evaluator in self.pool.evaluators]
+        return (sum(s.evaluations for s in stats), sum(s.steps for s in stats),
+                sum(s.busy_time for s in stats), sum(s.env_launches for s in stats))
+
+    def set_active(self, active: int):
+        self.pool.active = min(max(1, active), self.pool.size)
+        self.pool.close_surplus_envs()
+
+    def update(self, n: int, elapsed: float):
+        # Called by the pool after evaluating n individuals in elapsed seconds
+        totals = self.totals()
+        evaluations, steps, busy_time, launches = (t - l for t, l in zip(totals, self.last_totals))
+        self.last_totals = totals
+        if n == 0 or elapsed <= 0:
+            return
+        step_latency = busy_time / steps if steps > 0 else 0.0
+        self.history.append((self.pool.active, n / elapsed, step_latency))
+        if launches > 0:  # Launching unity dominates, measured again without launches
+            return
+        throughput = steps / elapsed if steps > 0 else n / elapsed
+
+        if self.state == "settled":
+            self.settled_throughput = ((1 - self.smoothing) * self.settled_throughput
+                                       + self.smoothing * throughput)
+            if self.settled_throughput < self.measured[self.best] * (1 - self.degradation):
+                print(f"[Autotune]: throughput degraded with {self.best} environments, searching again")
+                self.measured = {}
+                self.state = "up"
+                self.start = max(1, self.best // self.factor)
+                self.set_active(self.start)
+            return
+
+        active = self.pool.active
+        previous = max(self.measured.values()) if len(self.measured) > 0 else None
+        self.measured[active] = throughput
+        improved = previous is None or throughput > previous * (1 + self.tolerance)
+        if self.state == "up":
+            if improved and active < self.pool.size:
+                self.set_active(active * self.factor)
+            elif not improved and len(self.measured) == 2 and self.start > 1:
+                self.state = "down"  # Already slower after the first increase, try fewer environments
+                self.set_active(self.start // self.factor)
+            else:
+                self.settle()
+        elif self.state == "down":
+            if improved and active > 1:
+                self.set_active(active // self.factor)
+            else:
+                self.settle()
+
+    def settle(self):
+        # Fewest environments within the tolerance of the highest throughput, every unity instance costs memory
+        highest = max(self.measured.values())
+        self.best = min(active for active, throughput in self.measured.items()
+                        if throughput >= highest * (1 - self.tolerance))
+        self.state = "settled"
+        self.settled_throughput = self.measured[self.best]
+        self.set_active(self.best)
+        print(f"[Autotune]: using {self.best} parallel environments")
+
@@ -0,0 +1,15 @@
+import config
+from robot.individual import Individual
+
+COST_PER_MODULE = 0.1  # Relative cost of simulating and controlling one more module per step
+
+
+def estimate_cost(ind: Individual, eval_steps: int = config.EVALUATION_STEPS) -> float:
+    # Expected evaluation time from the steps the individual (or its parent) used last time and its size.
+    # Robots that were never evaluated, walked the whole time or hit a physics bug are expected to use every step
+    steps_used = getattr(ind, "steps_used", None)
+    if steps_used is None or getattr(ind, "termination", None) in ("completed", "physics"):
+        steps = eval_steps
+    else:
+        steps = min(steps_used, eval_steps)
+    return (config.WAIT_WHILE_FALLING_STEPS + steps) * (1 + COST_PER_MODULE * len(ind.modules))
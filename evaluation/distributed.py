@@ -0,0 +1,169 @@
+import time
+import secrets
+from multiprocessing.connection import Listener, Connection
+from collections.abc import Callable
+from threading import Thread, Condition
+
+import config
+from robot.individual import Individual
+from robot.genome_codec import encode
+from evaluation.dispatch import estimate_cost
+from evaluation.worker import (HEARTBEAT_TIMEOUT, AUTHKEY_ENV, StandInEvaluator, Worker, get_authkey, run_worker,
+                               start_local_workers)
+
+
+class _Call:
+    # Bookkeeping of one evaluate call, several calls (e.g. from the scheduler) can be in progress at once
+    def __init__(self, individuals: list[Individual]):
+        self.individuals = individuals
+        self.results = [None] * len(individuals)
+        self.remaining = len(individuals)
+
+
+class DistributedEvaluatorPool:
+    # Same interface as EvaluatorPool, but individuals are evaluated by remote workers connected over TCP.
+    # Only listens on localhost unless given another address. Without an authkey (argument or MODBOTS_AUTHKEY)
+    # a random one is generated and printed, workers need it to connect. evaluate raises if no worker has been
+    # connected for worker_timeout seconds
+    def __init__(self, address: tuple = ("127.0.0.1", 6000), authkey: str | bytes = None, batch_size: int = 1,
+                 worker_timeout: float = 120.0):
+        self.authkey = get_authkey(authkey)
+        if self.authkey is None:
+            self.authkey = secrets.token_hex(16).encode()
+            print(f"[Coordinator]: workers connect with --authkey {self.authkey.decode()} (or {AUTHKEY_ENV})")
+        self.listener = Listener(address, authkey=self.authkey)
+        self.address = self.listener.address
+        self.worker_timeout = worker_timeout
+        self.batch_size = batch_size
+        self.evaluators = []  # Evaluators live in the workers
+        self.tasks = []
+        self.next_task_id = 0
+        self.condition = Condition()
+        self.worker_stats = {}
+        self.interrupted = False
+        self.closed = False
+        Thread(target=self.accept, daemon=True).start()
+
+    @property
+    def size(self) -> int:
+        return max(1, sum(1 for stats in self.worker_stats.values() if stats["connected"]))
+
+    def accept(self):
+        while not self.closed:
+            try:
+                conn = self.listener.accept()
+            except OSError:
+                return
+            Thread(target=self.serve, args=(conn,), daemon=True).start()
+
+    def take_batch(self) -> list:
+        with self.condition:
+            while len(self.tasks) == 0 and not self.closed:
+                self.condition.wait()
+            batch = self.tasks[:self.batch_size]
+            del self.tasks[:self.batch_size]
+            return batch
+
+    def resubmit(self, batch: list):
+        with self.condition:
+            self.tasks[:0] = batch
+            self.condition.notify_all()
+
+    def serve(self, conn: Connection):
+        try:
+            _, name = conn.recv()
+        except (EOFError, OSError):
+            return
+        stats = {"connected": True, "evaluations": 0, "busy_time": 0.0, "lost_batches": 0, "since": time.time()}
+        self.worker_stats[name] = stats
+        while not self.closed:
+            batch = self.take_batch()
+            if len(batch) == 0:
+                break
+            start = time.time()
+            try:
+                conn.send(("evaluate", [task for task, _ in batch]))
+                while True:
+                    if not conn.poll(HEARTBEAT_TIMEOUT):
+                        raise TimeoutError
+                    message = conn.recv()
+                    if message[0] == "results":
+                        break
+            except (EOFError, OSError, TimeoutError):
+                print(f"[Coordinator]: lost worker {name}, resubmitting {len(batch)} evaluations")
+                stats["lost_batches"] += 1
+                stats["connected"] = False
+                self.resubmit(batch)
+                conn.close()
+                return
+            stats["busy_time"] += time.time() - start
+            stats["evaluations"] += len(batch)
+            self.complete(batch, message[1])
+        try:
+            conn.send(("stop",))
+        except OSError:
+            pass
+        stats["connected"] = False
+        conn.close()
+
+    def complete(self, batch: list, results: list):
+        calls = {task[0]: call_index for task, call_index in batch}
+        with self.condition:
+            for task_id, fitness, kept, steps_used, termination, behaviour in results:
+                call, index = calls[task_id]
+                ind = call.individuals[index]
+                if kept is not None:  # Same clean up as the worker did after unity skipped modules
+                    ind.clean_up_genome([ind.modules[i].name for i in kept])
+                ind.steps_used, ind.termination, ind.behaviour = steps_used, termination, behaviour
+                call.results[index] = fitness
+                call.remaining -= 1
+            self.condition.notify_all()
+
+    def evaluate(self, individuals: list[Individual], evaluation_func: Callable = None, build_path: str = None,
+                 seed: int = config.SEED, eval_steps: int = config.EVALUATION_STEPS, build_paths: list[str] = None,
+                 **kwargs) -> list[float]:
+        # evaluation_func is ignored, the workers decide how individuals are evaluated
+        call = _Call(individuals)
+        # Longest expected evaluations are sent first, the same order as EvaluatorPool
+        order = sorted(range(len(individuals)), key=lambda i: estimate_cost(individuals[i], eval_steps), reverse=True)
+        with self.condition:
+            for i in order:
+                ind = individuals[i]
+                path = build_paths[i] if build_paths is not None else build_path
+                task = (self.next_task_id, encode(ind), path, seed, eval_steps, getattr(ind, "evaluation_sample", 0))
+                self.tasks.append((task, (call, i)))
+                self.next_task_id += 1
+            self.condition.notify_all()
+            without_workers = None  # Since when no worker is connected
+            try:
+                while call.remaining > 0:
+                    self.condition.wait(timeout=1.0)
+                    if any(stats["connected"] for stats in self.worker_stats.values()):
+                        without_workers = None
+                    elif without_workers is None:
+                        without_workers = time.time()
+                    elif time.time() - without_workers > self.worker_timeout:
+                        self.tasks = [t for t in self.tasks if t[1][0] is not call]
+                        raise RuntimeError(f"No evaluation worker connected for {self.worker_timeout:.0f} s, "
+                                           f"{call.remaining} evaluations left")
+            except KeyboardInterrupt:
+                print("\nEvaluation interrupted.")
+                self.interrupted = True
+                self.tasks = [t for t in self.tasks if t[1][0] is not call]
+        return call.results
+
+    def throughput(self) -> dict:
+        # Evaluations per second of every worker, while busy and since it connected
+        now = time.time()
+        return {name: {"evaluations": stats["evaluations"],
+                       "busy evals/s": stats["evaluations"] / stats["busy_time"] if stats["busy_time"] > 0 else 0.0,
+                       "evals/s": stats["evaluations"] / (now - stats["since"]),
+                       "lost batches": stats["lost_batches"],
+                       "connected": stats["connected"]}
+                for name, stats in self.worker_stats.items()}
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.listener.close()
@@ -2,6 +2,9 @@ from mlagents_envs.environment import UnityEnvironment
 from mlagents_envs.base_env import (
     ActionTuple
 )
+import os
+import time
+from collections import OrderedDict
 import socket
 from evaluation.unity_side_channel import CustomSideChannel
 import numpy as np
@@ -12,14 +15,45 @@ from robot.individual import Individual
 
 
 HIGHEST_WORKER_ID = 65535 - UnityEnvironment.BASE_ENVIRONMENT_PORT
+worker_id_random = random.Random()  # Not the global random, so launching unity does not change the mutations
+
+
+def get_unity_build_path(env: str) -> str:
+    # Path of the build for the given terrain (e.g. "flat" or "stairs") on mac or linux
+    if os.path.exists(f"{config.UNITY_BUILD_BASE_PATH}/{env}.app"):
+        return f"{config.UNITY_BUILD_BASE_PATH}/{env}"
+    elif os.path.exists(f"{config.UNITY_BUILD_BASE_PATH}/{env}/{env}.x86_64"):
+        return f"{config.UNITY_BUILD_BASE_PATH}/{env}/{env}"
+    return config.UNITY_BUILD_PATH
+
+
+class EvaluatorStats:
+    # Only written by the thread that has borrowed the evaluator, read once per generation by the metrics exporter
+    def __init__(self):
+        self.evaluations = 0
+        self.steps = 0
+        self.early_terminations = 0
+        self.env_launches = 0
+        self.busy_time = 0.0
+        self.durations = []  # Seconds per evaluation since the exporter last took them
+
+    def take_durations(self) -> list[float]:
+        durations, self.durations = self.durations, []
+        return durations
 
 
 class Evaluator:
-    def __init__(self, no_graphics: bool = True, editor_mode: bool = False):
+    def __init__(self, no_graphics: bool = True, editor_mode: bool = False, build_path: str = None,
+                 seed: int = config.SEED):
         self.no_graphics = no_graphics
         self.editor_mode = editor_mode
-        self.env = None
+        self.build_path = build_path  # None means config.UNITY_BUILD_PATH
+        self.seed = seed
+        self.env = None  # The env of build_path and seed
+        self.envs = OrderedDict()  # (build_path, seed) -> running env, kept when switching e.g. terrain
         self.channel = CustomSideChannel()
+        self.clean_ups = 0  # Genomes cleaned up because unity skipped overlapping modules
+        self.stats = EvaluatorStats()
 
     @staticmethod
     def is_port_in_use(port: int) -> bool:
@@ -32,21 +66,50 @@ class Evaluator:
 
     @staticmethod
     def get_worker_id() -> int:
-        pid = random.randrange(HIGHEST_WORKER_ID)
+        pid = worker_id_random.randrange(HIGHEST_WORKER_ID)
         while not Evaluator.is_worker_id_open(pid):
             print("Socket is occupied, trying a new worker_id")
-            pid = random.randrange(HIGHEST_WORKER_ID)
+            pid = worker_id_random.randrange(HIGHEST_WORKER_ID)
         return pid
 
+    def configure(self, build_path: str = None, seed: int = config.SEED):
+        # The build and seed are set when unity is launched, a running env of other settings is kept for later
+        self.build_path = build_path
+        self.seed = seed
+        self.env = self.envs.get((build_path, seed))
+        if self.env is not None:
+            self.envs.move_to_end((build_path, seed))
+
+    def has_env(self, build_path: str = None, seed: int = config.SEED) -> bool:
+        return (build_path, seed) in self.envs
+
+    @property
+    def max_envs(self) -> int:
+        # The editor can only run one
+        return 1 if self.editor_mode else config.MAX_ENVS_PER_EVALUATOR
+
+    def close_oldest_env(self):
+        # Least recently used env
+        _, env = self.envs.popitem(last=False)
+        env.close()
+        if env is self.env:
+            self.env = None
+
     def get_env(self):
         if self.env is None:
+            while len(self.envs) >= self.max_envs:
+                self.close_oldest_env()
+            build_path = self.build_path if self.build_path is not None else config.UNITY_BUILD_PATH
+            side_channels = [self.channel]
             if self.editor_mode:
-                self.env = UnityEnvironment(seed=config.SEED, side_channels=[self.channel],
+                self.env = UnityEnvironment(seed=self.seed, side_channels=side_channels,
                                             no_graphics=self.no_graphics) 
             else:
-                self.env = UnityEnvironment(file_name=config.UNITY_BUILD_PATH, seed=config.SEED,
-                                            side_channels=[self.channel], no_graphics=self.no_graphics,
+                self.env = UnityEnvironment(file_name=build_path, seed=self.seed,
+                                            side_channels=side_channels, no_graphics=self.no_graphics,
                                             worker_id=Evaluator.get_worker_id(), log_folder=config.LOG_PATH)
+            self.stats.env_launches += 1
+            self.envs[(self.build_path, self.seed)] = self.env
             for _ in range(10):  # Fixes determinism
                 self.env.step()
         
@@ -54,11 +117,14 @@ class Evaluator:
         return self.env
 
     def close_env(self):
-        if self.env is not None:
-            self.env.close()
-            self.env = None
+        # Closes every running env of this evaluator
+        for env in self.envs.values():
+            env.close()
+        self.envs.clear()
+        self.env = None
 
     def evaluate(self, ind: Individual, debug: bool = False, eval_steps: int = config.EVALUATION_STEPS) -> np.float32:
+        start = time.perf_counter()
         env = self.get_env()
 
         ind.reset_controllers()
@@ -77,8 +143,13 @@ class Evaluator:
         max_fitness = -1.0
         total_movement = 0.0
         behavior_name = list(env.behavior_specs)[0]
-        
+        steps = 0
+        termination = "completed"
+        sample_interval = max(1, eval_steps // config.BEHAVIOUR_SAMPLES)
+        trace = []
+
         for s in range(eval_steps):
+            steps += 1
             obs, _ = env.get_steps(behavior_name)
             actions = np.ndarray(shape=(1, config.MAX_MODULES_UNITY), dtype=np.float32)
             actions = ind.get_next_action(actions, config.PYTHON_DELTA_TIME)
@@ -90,14 +161,19 @@ class Evaluator:
                 print("Cannot get fitness")
 
             total_movement += np.abs(fitness)
+            if s % sample_interval == sample_interval - 1 and len(trace) < config.BEHAVIOUR_SAMPLES:
+                trace.append(float(fitness))
             if fitness > max_fitness:
                 max_fitness = fitness
             if fitness < -2 or max_fitness - fitness > 1:
+                termination = "fell"
                 break
             if s > 30 and total_movement < 0.2:
+                termination = "stuck"
                 break
             if fitness > config.MAX_FITNESS:  # If a physics bug occurs to get an impossibly high fitness value
                 fitness = max_fitness = 0
+                termination = "physics"
                 break
 
             env.step()
@@ -109,6 +185,17 @@ class Evaluator:
             module_keys = self.channel.created_robot_module_keys
             if len(ind.modules) != len(module_keys):
                 ind.clean_up_genome(module_keys)
-
+                self.clean_ups += 1
+
+        ind.steps_used = steps  # Inherited by offspring to estimate how long their evaluation takes
+        ind.termination = termination
+        # Robots that stopped early stay where they were for the rest of the trace
+        ind.behaviour = trace + [float(fitness)] * (config.BEHAVIOUR_SAMPLES - len(trace))
+        duration = time.perf_counter() - start
+        self.stats.evaluations += 1
+        self.stats.steps += steps
+        self.stats.early_terminations += termination != "completed"
+        self.stats.busy_time += duration
+        self.stats.durations.append(duration)
         return np.round(max_fitness, 3)
 
@@ -0,0 +1,198 @@
+from collections.abc import Callable
+from contextlib import contextmanager
+from tqdm import tqdm
+import time
+import queue
+from multiprocessing import (
+    connection,
+)  # Has to be here to avoid threading import bug...
+from threading import Thread, Condition, local
+
+import config
+from robot.individual import Individual
+from evaluation.evaluator import Evaluator
+from evaluation.autotune import PoolAutotuner
+from evaluation.dispatch import estimate_cost
+
+
+class EvaluatorPool:
+    def __init__(self, size: int = 1, no_graphics: bool = True, editor_mode: bool = False):
+        self.size = size
+        self.active = size  # Live unity environments, lowered by the autotuner
+        self.launching = 0  # Borrowed evaluators that will launch another env
+        self.borrowed = 0  # At most active at once, whichever map calls (e.g. concurrent scheduler jobs) borrow them
+        self.autotuner = None
+        self.evaluators = [Evaluator(no_graphics=no_graphics, editor_mode=editor_mode) for _ in range(size)]
+        self.idle = self.evaluators[:]
+        self.condition = Condition()
+        self.interrupted = False
+        self.local = local()  # Tail latency of the last map call of each calling thread
+
+    def autotune(self, **kwargs) -> PoolAutotuner:
+        # Ramps the number of live environments up to size while throughput improves, see PoolAutotuner
+        self.autotuner = PoolAutotuner(self, **kwargs)
+        return self.autotuner
+
+    @property
+    def live_envs(self) -> int:
+        # Unity players running in the pool, an evaluator keeps up to MAX_ENVS_PER_EVALUATOR of them
+        return sum(len(e.envs) for e in self.evaluators)
+
+    def close_surplus_envs(self):
+        # Keeps at most active unity environments running (or launching), envs of idle evaluators beyond that are
+        # closed to free memory
+        with self.condition:
+            self._close_idle_envs(self.live_envs + self.launching - self.active)
+
+    def _close_idle_envs(self, n: int, exclude: Evaluator = None) -> int:
+        closed = 0
+        for evaluator in sorted(self.idle, key=lambda e: len(e.envs), reverse=True):
+            while closed < n and len(evaluator.envs) > 0 and evaluator is not exclude:
+                evaluator.close_oldest_env()
+                closed += 1
+        return closed
+
+    @contextmanager
+    def evaluator(self, build_path: str = None, seed: int = config.SEED):
+        # Borrows an idle evaluator, preferring one that already runs the requested build and seed.
+        # Launching another env waits if active envs are already running, unless an idle one can be closed for it
+        with self.condition:
+            while True:
+                while len(self.idle) == 0 or self.borrowed >= self.active:
+                    self.condition.wait()
+                # One with a running env of the build and seed first, then one with room for another env
+                evaluator = min(self.idle, key=lambda e: 0 if e.has_env(build_path, seed)
+                                else 1 if len(e.envs) < e.max_envs else 2)
+                launches = not evaluator.has_env(build_path, seed)
+                if not launches or self.live_envs + self.launching < self.active:
+                    break
+                if len(evaluator.envs) > 0:  # Replaces its own least recently used env
+                    evaluator.close_oldest_env()
+                    break
+                if self._close_idle_envs(1, exclude=evaluator) == 1:
+                    break
+                self.condition.wait()
+            self.idle.remove(evaluator)
+            if launches and len(evaluator.envs) >= evaluator.max_envs:
+                evaluator.close_oldest_env()  # get_env would close it outside of the lock
+            self.launching += launches
+            self.borrowed += 1
+        try:
+            evaluator.configure(build_path, seed)
+            yield evaluator
+        finally:
+            with self.condition:
+                self.idle.append(evaluator)
+                self.launching -= launches
+                self.borrowed -= 1
+                self._close_idle_envs(self.live_envs + self.launching - self.active)  # E.g. active was lowered
+                self.condition.notify_all()
+
+    @property
+    def tail_latency(self) -> float:
+        # Seconds from the first evaluator running out of work to the end of the last map call of this thread
+        return getattr(self.local, "tail_latency", 0.0)
+
+    def prewarm(self, build_path: str = None, seed: int = config.SEED, n: int = None):
+        # Launches unity in the background, e.g. while the initial population is created.
+        # Evaluators are borrowed until their env is running, so evaluations wait for them instead of launching again
+        n = min(n if n is not None else self.active, self.size)
+        with self.condition:
+            running = sum(1 for e in self.evaluators if e.has_env(build_path, seed))
+            room = min(self.active - self.live_envs - self.launching,  # Envs of other settings are not closed for it
+                       self.active - self.borrowed)
+            cold = [e for e in self.idle if not e.has_env(build_path, seed)][:max(0, min(n - running, room))]
+            for evaluator in cold:
+                self.idle.remove(evaluator)
+            self.launching += len(cold)
+            self.borrowed += len(cold)
+        for evaluator in cold:
+            Thread(target=self._prewarm, args=(evaluator, build_path, seed), daemon=True).start()
+
+    def _prewarm(self, evaluator: Evaluator, build_path: str, seed: int):
+        try:
+            evaluator.configure(build_path, seed)
+            evaluator.get_env()
+        except Exception as e:  # Launched again by the first evaluation
+            print(f"[Prewarm]: could not launch unity: {e}")
+        finally:
+            with self.condition:
+                self.idle.append(evaluator)
+                self.launching -= 1
+                self.borrowed -= 1
+                self.condition.notify_all()
+
+    def map(self, function: Callable, items: list, settings: list[tuple] = None,
+            desc: str = "Evaluating Population", costs: list[float] = None) -> list:
+        # Returns function(evaluator, item) for every item, settings[i] is the (build_path, seed) of items[i].
+        # Items with the highest cost are dispatched first so no long evaluation is started last
+        results = [None] * len(items)
+        if settings is None:
+            settings = [(None, config.SEED)] * len(items)
+        order = list(range(len(items)))
+        if costs is not None:
+            order.sort(key=lambda i: costs[i], reverse=True)
+        first_idle = [None]
+
+        start = time.perf_counter()
+        if self.active == 1:
+            try:
+                for i in tqdm(order, desc=desc):
+                    with self.evaluator(*settings[i]) as evaluator:
+                        results[i] = function(evaluator, items[i])
+            except KeyboardInterrupt:
+                print("\nEvaluation interrupted.")
+                self.interrupted = True
+        else:
+            threads = []
+            try:
+                task_queue = queue.Queue()
+                for i in order:
+                    task_queue.put(i)
+
+                for _ in range(min(self.active, len(items))):
+                    thread = Thread(target=self._work,
+                                    args=(task_queue, function, items, settings, results, first_idle))
+                    threads.append(thread)
+                    thread.start()
+
+                for t in threads:
+                    t.join()
+
+            except KeyboardInterrupt:
+                print("\nEvaluation interrupted, wait for threads to terminate.")
+                self.interrupted = True
+                for t in tqdm(threads):
+                    t.join()
+        end = time.perf_counter()
+        self.local.tail_latency = end - first_idle[0] if first_idle[0] is not None else 0.0
+        if self.autotuner is not None and not self.interrupted:
+            self.autotuner.update(len(items), end - start)
+        return results
+
+    def _work(self, task_queue: queue.Queue, function: Callable, items: list, settings: list, results: list,
+              first_idle: list):
+        while not self.interrupted:
+            try:
+                i = task_queue.get_nowait()
+            except queue.Empty:
+                if first_idle[0] is None:
+                    first_idle[0] = time.perf_counter()
+                return
+            with self.evaluator(*settings[i]) as evaluator:
+                results[i] = function(evaluator, items[i])
+
+    def evaluate(self, individuals: list[Individual], evaluation_func: Callable = Evaluator.evaluate,
+                 build_path: str = None, seed: int = config.SEED, build_paths: list[str] = None,
+                 **kwargs) -> list[float]:
+        # build_paths[i] is used for individuals[i] instead of build_path, e.g. to evaluate several terrains at once
+        eval_steps = kwargs.get("eval_steps", config.EVALUATION_STEPS)
+        if build_paths is None:
+            build_paths = [build_path] * len(individuals)
+        return self.map(lambda evaluator, ind: evaluation_func(evaluator, ind, **kwargs), individuals,
+                        [(path, seed) for path in build_paths],
+                        costs=[estimate_cost(ind, eval_steps) for ind in individuals])
+
+    def close(self):
+        for evaluator in self.evaluators:
+            evaluator.close_env()
@@ -0,0 +1,37 @@
+from collections import OrderedDict
+from threading import Lock
+
+from robot.individual import Individual
+from robot.genome_codec import genome_key
+
+
+class FitnessCache:
+    # Fitness of already simulated genomes, keyed by genome_key and the evaluation settings
+    def __init__(self, max_size: int = 100000):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, fitness: float, kept: list[int] = None, terrain_fitnesses: dict = None,
+            behaviour: list[float] = None):
+        # kept are the indices of the modules left after clean up, None if nothing was removed
+        with self.lock:
+            self.entries[key] = (fitness, kept, terrain_fitnesses, behaviour)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def key(self, ind: Individual, *context) -> str:
+        return genome_key(ind, *context)
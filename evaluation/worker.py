@@ -0,0 +1,139 @@
+import os
+import time
+import random
+import argparse
+import multiprocessing
+from multiprocessing.connection import Client, Connection
+from threading import Thread, Lock, Event
+import numpy as np
+
+import config
+from robot.individual import Individual
+from robot.genome_codec import decode, genome_key
+
+# Entry point of evaluation worker processes. Only the evaluator, genome and controller code is imported here,
+# the coordinator side (evaluation/distributed.py) and the evolutionary algorithms are not needed by a worker
+HEARTBEAT_INTERVAL = 2.0  # Seconds between heartbeats from a worker that is evaluating
+HEARTBEAT_TIMEOUT = 30.0  # A worker is considered lost if nothing is heard for this long
+AUTHKEY_ENV = "MODBOTS_AUTHKEY"  # Shared secret of the coordinator and its workers, if not passed explicitly
+
+
+def get_authkey(authkey: str | bytes = None) -> bytes | None:
+    # Connections unpickle what they receive, so there is no default key: the given one or the environment's
+    if authkey is None:
+        authkey = os.environ.get(AUTHKEY_ENV)
+    if isinstance(authkey, str):
+        authkey = authkey.encode()
+    return authkey
+
+
+class StandInEvaluator:
+    # Same interface as Evaluator but without unity, fitness only depends on the genome and the seed
+    def __init__(self, step_time: float = 0.0):
+        self.step_time = step_time
+        self.build_path = None
+        self.seed = config.SEED
+        self.env = None
+
+    def configure(self, build_path: str = None, seed: int = config.SEED):
+        self.build_path = build_path
+        self.seed = seed
+
+    def evaluate(self, ind: Individual, debug: bool = False, eval_steps: int = config.EVALUATION_STEPS) -> float:
+        context = (self.seed,) if ind.evaluation_sample == 0 else (self.seed, ind.evaluation_sample)
+        rng = random.Random(genome_key(ind, *context))
+        amps = [module.controller.amp for module in ind.modules]
+        time.sleep(self.step_time * eval_steps)
+        ind.steps_used = eval_steps
+        ind.termination = "completed"
+        fitness = np.round(len(ind.modules) * np.mean(amps) + rng.random(), 3)
+        ind.behaviour = [float(fitness) * (i + 1) / config.BEHAVIOUR_SAMPLES for i in range(config.BEHAVIOUR_SAMPLES)]
+        return fitness
+
+    def close_env(self):
+        pass
+
+
+class Worker:
+    def __init__(self, address: tuple, authkey: bytes, stand_in: bool = False,
+                 no_graphics: bool = True, step_time: float = 0.0):
+        self.address = address
+        self.authkey = authkey
+        if stand_in:
+            self.evaluator = StandInEvaluator(step_time)
+        else:
+            from evaluation.evaluator import Evaluator  # Only workers with unity need mlagents
+            self.evaluator = Evaluator(no_graphics=no_graphics)
+        self.send_lock = Lock()
+
+    def send(self, conn: Connection, message: tuple):
+        with self.send_lock:
+            conn.send(message)
+
+    def heartbeat(self, conn: Connection, done: Event):
+        while not done.wait(HEARTBEAT_INTERVAL):
+            try:
+                self.send(conn, ("heartbeat",))
+            except OSError:
+                return
+
+    def evaluate_task(self, task: tuple) -> tuple:
+        task_id, genome, build_path, seed, eval_steps, sample = task
+        ind = decode(genome)
+        ind.evaluation_sample = sample
+        indices = {module.name: i for i, module in enumerate(ind.modules)}
+        self.evaluator.configure(build_path, seed)
+        fitness = self.evaluator.evaluate(ind, eval_steps=eval_steps)
+        # Only the module indices left after clean up are sent back, the coordinator knows the names
+        kept = [indices[module.name] for module in ind.modules]
+        return (task_id, fitness, kept if len(kept) != len(indices) else None, ind.steps_used, ind.termination,
+                ind.behaviour)
+
+    def run(self):
+        conn = Client(self.address, authkey=self.authkey)
+        self.send(conn, ("hello", f"{multiprocessing.current_process().name}-{random.randrange(1 << 16)}"))
+        try:
+            while True:
+                message = conn.recv()
+                if message[0] == "stop":
+                    break
+                done = Event()
+                Thread(target=self.heartbeat, args=(conn, done), daemon=True).start()
+                try:
+                    results = [self.evaluate_task(task) for task in message[1]]
+                finally:
+                    done.set()
+                self.send(conn, ("results", results))
+        except (EOFError, OSError):
+            pass
+        finally:
+            self.evaluator.close_env()
+            conn.close()
+
+
+def run_worker(address: tuple, authkey: bytes, stand_in: bool = False, step_time: float = 0.0):
+    Worker(address, authkey, stand_in=stand_in, step_time=step_time).run()
+
+
+def start_local_workers(address: tuple, n: int, authkey: bytes, stand_in: bool = True,
+                        step_time: float = 0.0) -> list:
+    # Local worker processes, e.g. with stand-in evaluators to test the coordinator without unity
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=run_worker, args=(address, authkey, stand_in, step_time), daemon=True)
+                 for _ in range(n)]
+    for process in processes:
+        process.start()
+    return processes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluation worker, connects to a DistributedEvaluatorPool")
+    parser.add_argument("host")
+    parser.add_argument("port", type=int)
+    parser.add_argument("--authkey", help=f"Printed by the coordinator, or set {AUTHKEY_ENV}")
+    parser.add_argument("--stand-in", action="store_true", help="Use a stand-in evaluator instead of unity")
+    args = parser.parse_args()
+    authkey = get_authkey(args.authkey)
+    if authkey is None:
+        parser.error(f"No authkey, pass --authkey or set {AUTHKEY_ENV}")
+    run_worker((args.host, args.port), authkey, stand_in=args.stand_in)
@@ -7,11 +7,12 @@ from robot.individual import Individual
 from controllers.controller import Controller
 
 
-def pareto_tournament_selection(population: list, population_size: int, tournament_size: int):
+def pareto_tournament_selection(population: list, population_size: int, tournament_size: int,
+                                fit_attr: str = "fitness"):
     new_pop = []
     while len(new_pop) < population_size:
         tournament = np.random.choice(population, tournament_size)
-        tournament = sorted(tournament, key=lambda x: x.fitness, reverse=True)
+        tournament = sorted(tournament, key=lambda x: getattr(x, fit_attr), reverse=True)
         new_pop.append(tournament[0])  # Highest fitness
         for ind in tournament[1:]:
             if ind.morph_age < new_pop[-1].morph_age:
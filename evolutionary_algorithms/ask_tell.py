@@ -0,0 +1,63 @@
+import time
+from collections.abc import Callable
+
+from robot.individual import Individual
+from controllers.controller import Controller
+from evolutionary_algorithms.only_controller import EA
+from evolutionary_algorithms.optimizers import ControllerSpace, CMAES, BayesianOptimizer, OPTIMIZERS
+from seeding import derive_seed
+
+
+class AskTell(EA):
+    # Optimizes the controllers of a fixed morphology with an ask/tell optimizer instead of selection and mutation.
+    # Every generation asks population_size parameter vectors, so the population size should fill the pool
+    def __init__(self, evaluation_func: Callable[[Individual], float], controller_class: type[Controller],
+                 robot_config_path: str, optimizer: str = "cmaes", sigma: float = 0.3, parallel_processes: int = 1,
+                 no_graphics: bool = True):
+        if optimizer not in OPTIMIZERS:
+            raise ValueError(f"Unknown optimizer {optimizer}, use one of {OPTIMIZERS}")
+        super().__init__(evaluation_func, controller_class, 0, 0, robot_config_path,
+                         parallel_processes=parallel_processes, no_graphics=no_graphics)
+        self.optimizer_name = optimizer
+        self.sigma = sigma  # Initial step size of CMA-ES in the unit cube
+        self.optimizer = None
+        self.space = None
+        self.samples = []  # Parameter vectors of the population, as asked from the optimizer
+        self.toolbox.register("population", self.ask)
+
+    def spec_dict(self) -> dict:
+        spec_dict = super().spec_dict()
+        spec_dict["evolution"] = f"ask-tell {self.optimizer_name}"
+        spec_dict["optimizer sigma"] = self.sigma
+        return spec_dict
+
+    def create_optimizer(self):
+        seed = derive_seed(self.run_config.random_seed, "optimizer")
+        if self.optimizer_name == "cmaes":
+            return CMAES(self.space.to_vector(self.space.template), self.sigma, seed=seed)
+        return BayesianOptimizer(self.space.dimensions, seed=seed)
+
+    def ask(self, n: int) -> list[Individual]:
+        if self.optimizer is None:  # Starts from the controllers of the first individual of the run
+            self.space = ControllerSpace(self.toolbox.individual())
+            self.optimizer = self.create_optimizer()
+        self.samples = self.optimizer.ask(n)
+        return [self.space.to_individual(x) for x in self.samples]
+
+    def reset(self, population_size: int):
+        self.optimizer = None
+        super().reset(population_size)
+
+    def step(self, elitism: int = 0):
+        # elitism is not used, the optimizer keeps its own state between generations
+        timer = time.time()
+        self.generation += 1
+        self.profiler.start_generation(self.generation)
+        with self.profiler.phase("tell"):
+            self.optimizer.tell(self.samples, [ind.fitness for ind in self.population])
+        with self.profiler.phase("ask"):
+            self.population[:] = self.ask(self.population_size)
+
+        with self.profiler.phase("evaluate"):
+            self.evaluate_population()
+        self.record_generation(timer)
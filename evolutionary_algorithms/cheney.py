@@ -17,12 +17,12 @@ from controllers.coupled_oscillator import CoupledOscillator
 from evolutionary_algorithms.tournament_remove import TournamentRemove
 from evaluation.evaluator import Evaluator
 
-def pareto_selection(population: list, n: int):
+def pareto_selection(population: list, n: int, fit_attr: str = "fitness"):
     if len(population) <= n:
         return population
 
     pareto_front = []
-    sorted_pop = sorted(population, key=lambda x: x.fitness, reverse=True)
+    sorted_pop = sorted(population, key=lambda x: getattr(x, fit_attr), reverse=True)
 
     while len(pareto_front) < n:
         pareto_front.append(sorted_pop[0])  # Highest fitness
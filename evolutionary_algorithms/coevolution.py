@@ -1,11 +1,11 @@
 import time
 from collections.abc import Callable
 from deap import tools
-import numpy as np
 
 from robot.individual import Individual
 from controllers.controller import Controller
 from evolutionary_algorithms.only_controller import EA
+from seeding import seed_random
 
 
 class Coevolution(EA):
@@ -29,29 +29,23 @@ class Coevolution(EA):
     def step(self, elitism: int = 0):
         timer = time.time()
         self.generation += 1
-        offspring = self.toolbox.select(self.population, self.population_size - elitism)
-        offspring = list(map(self.toolbox.clone, offspring))
-        elites = self.toolbox.get_best(self.population, k=elitism)
+        self.profiler.start_generation(self.generation)
+        seed_random(self.run_config.random_seed, self.generation)
+        with self.profiler.phase("select"):
+            offspring = self.toolbox.select(self.population, self.population_size - elitism)
+        with self.profiler.phase("clone"):
+            offspring = list(map(self.toolbox.clone, offspring))
+            elites = self.summary.best(elitism)
 
-        for ind in offspring:
-            self.toolbox.mutate_controller(ind)
-            self.toolbox.mutate_body(ind)
+        with self.profiler.phase("mutate"):
+            self.toolbox.mutate_controllers(offspring)
+            for i, ind in enumerate(offspring):
+                seed_random(self.run_config.random_seed, self.generation, i)  # Independent of the other offspring
+                self.toolbox.mutate_body(ind)
+        with self.profiler.phase("retune"):
+            self.retune(offspring)
 
         self.population[:] = offspring + elites
-        self.evaluate_population()
-        self.diversity_features.append([ind.get_diversity_features() for ind in self.population])
-        self.joint_tables.append([ind.build_joint_table() for ind in self.population])
-        self.fitnesses_of_each_gen.append([ind.fitness for ind in self.population])
-        self.best_of_each_gen.append(self.toolbox.get_best(self.population, k=1)[0])
-        record = self.stats.compile(self.population)
-        timer = time.time() - timer
-        ages = [ind.morph_age for ind in self.population]
-        number_of_modules = [len(ind.modules) for ind in self.population]
-        average_age = np.mean(ages)
-        average_modules = np.mean(number_of_modules)
-        std_modules = np.std(number_of_modules)
-        self.logbook.record(gen=self.generation, avg_age=average_age, modules=average_modules,
-                            std_modules=std_modules, time=timer, **record)
-        top20 = self.toolbox.get_best(self.population, k=20)
-        fitnesses_ages = [[ind.fitness, ind.morph_age] for ind in top20]
-        self.fitness_and_ages_of_top20_per_gen.append(fitnesses_ages)
+        with self.profiler.phase("evaluate"):
+            self.evaluate_population()
+        self.record_generation(timer)
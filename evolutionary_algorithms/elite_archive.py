@@ -0,0 +1,109 @@
+import os
+import heapq
+import numpy as np
+
+from robot.individual import Individual
+from robot.genome_codec import GENOME_DTYPE, CODEC_VERSION, HEADER, MAGIC, to_records, from_records, record_key
+
+
+class EliteArchive:
+    # The k best distinct robots of a run. Elites are genome codec records in k fixed slots, a min-heap of the
+    # slots by fitness finds the one to replace, and robots are told apart by their genome key, so the same
+    # robot found in many generations keeps one slot with its latest fitness. Memory does not grow with the run.
+    # With a path the slots are a memory-mapped .genomes file that is written in place, load_genomes reads it
+    # (the elites found up to the last flush) while the run is going
+    def __init__(self, k: int = 200, path: str = None):
+        self.k = k
+        self.path = path
+        self.controller_class = None  # Of the first individuals added, the file header needs it
+        self.records = np.zeros(k, dtype=GENOME_DTYPE)
+        self.size = 0
+        self.keys = [None] * k
+        self.slots = {}  # Genome key to slot
+        self.versions = np.zeros(k, dtype=np.int64)  # Heap entries of older versions of a slot are stale
+        self.heap = []  # (fitness, version, slot)
+        self.inserted = 0  # Since the last take_stats
+
+    def __len__(self) -> int:
+        return self.size
+
+    def spec_dict(self) -> dict:
+        return {"elite archive size": self.k}
+
+    def open(self, controller_class: type):
+        self.controller_class = controller_class
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "wb") as file:
+            file.truncate(HEADER.size + self.k * GENOME_DTYPE.itemsize)
+        self.records = np.memmap(self.path, dtype=GENOME_DTYPE, mode="r+", offset=HEADER.size, shape=(self.k,))
+        self.flush()
+
+    def clear(self):
+        # Every run of the EA (e.g. each replicate) starts an empty archive
+        self.size = 0
+        self.keys = [None] * self.k
+        self.slots = {}
+        self.heap = []
+        if self.controller_class is not None:
+            self.flush()
+
+    def min_fitness(self) -> float:
+        while self.heap[0][1] != self.versions[self.heap[0][2]]:
+            heapq.heappop(self.heap)
+        return self.heap[0][0]
+
+    def add(self, individuals: list[Individual]) -> int:
+        # Returns the number of robots that got into the archive
+        if len(individuals) == 0:
+            return 0
+        if self.controller_class is None:
+            self.open(individuals[0].controller_class)
+        records = to_records(individuals)
+        fitnesses = records["fitness"].tolist()
+        inserted = 0
+        for record, fitness in zip(records, fitnesses):
+            key = record_key(record)
+            slot = self.slots.get(key)
+            if slot is None:
+                if self.size < self.k:
+                    slot = self.size
+                    self.size += 1
+                elif fitness > self.min_fitness():
+                    slot = heapq.heappop(self.heap)[2]
+                    del self.slots[self.keys[slot]]
+                else:
+                    continue
+                self.slots[key] = slot
+                self.keys[slot] = key
+                inserted += 1
+            elif fitness == self.records["fitness"][slot]:
+                continue
+            self.records[slot] = record
+            self.versions[slot] += 1
+            heapq.heappush(self.heap, (fitness, int(self.versions[slot]), slot))
+        if len(self.heap) > 2 * self.k:  # Drops the stale entries
+            self.heap = [(fitness, int(self.versions[slot]), slot)
+                         for slot, fitness in enumerate(self.records["fitness"][:self.size].tolist())]
+            heapq.heapify(self.heap)
+        self.inserted += inserted
+        return inserted
+
+    def elites(self) -> list[Individual]:
+        # Best first
+        order = np.argsort(-self.records["fitness"][:self.size], kind="stable")
+        return from_records(self.records[:self.size][order], self.controller_class)
+
+    def flush(self):
+        # Checkpoint, the header has the number of elites so far
+        if isinstance(self.records, np.memmap):
+            self.records.flush()
+            with open(self.path, "r+b") as file:
+                file.write(HEADER.pack(MAGIC, CODEC_VERSION, self.controller_class.__name__.encode(), self.size))
+
+    def take_stats(self) -> dict:
+        stats = {"elites": self.size, "elites_min": self.min_fitness() if self.size > 0 else np.nan,
+                 "elites_inserted": self.inserted}
+        self.inserted = 0
+        return stats
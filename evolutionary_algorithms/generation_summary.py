@@ -0,0 +1,75 @@
+import json
+from collections.abc import Callable
+from functools import partial
+import numpy as np
+
+QUANTILES = (0.0, 0.25, 0.5, 0.75, 1.0)
+QUANTILE_NAMES = ("min", "q1", "median", "q3", "max")
+
+
+def top_k_indices(values: np.ndarray, k: int) -> np.ndarray:
+    # Indices of the k highest values, sorted from best to worst, without sorting the whole array
+    k = min(k, len(values))
+    if k <= 0:
+        return np.empty(0, dtype=int)
+    if k < len(values):
+        indices = np.argpartition(-values, k - 1)[:k]
+    else:
+        indices = np.arange(len(values))
+    return indices[np.argsort(-values[indices], kind="stable")]
+
+
+class GenerationSummary:
+    def __init__(self, top_k: int = 20):
+        self.top_k = top_k
+        self.metrics = {}
+        self.population = []
+        self.fitnesses = np.empty(0)
+        self.ages = np.empty(0)
+        self.modules = np.empty(0)
+        self.top = []
+
+    def register(self, name: str, function: Callable, *args, key: str = "fitness", **kargs):
+        # key is one of "fitness", "age", "modules" or None to pass the population itself
+        self.metrics[name] = (key, partial(function, *args, **kargs))
+
+    def extract(self, population: list):
+        n = len(population)
+        self.population = population
+        self.fitnesses = np.fromiter((ind.fitness for ind in population), dtype=np.float64, count=n)
+        self.ages = np.fromiter((ind.morph_age for ind in population), dtype=np.float64, count=n)
+        self.modules = np.fromiter((len(ind.modules) for ind in population), dtype=np.float64, count=n)
+
+    def compile(self, population: list) -> dict:
+        self.extract(population)
+        self.top = [population[i] for i in top_k_indices(self.fitnesses, self.top_k)]
+
+        quantiles = np.quantile(self.fitnesses, QUANTILES)  # One partition based call for all quantiles
+        quantiles[np.isnan(quantiles)] = -np.inf  # Interpolated next to skipped robots (-inf fitness)
+        record = {name: float(value) for name, value in zip(QUANTILE_NAMES, quantiles)}
+        finite = self.fitnesses[np.isfinite(self.fitnesses)]  # Without robots ruled out by RunConfig.skip_below
+        record["avg"] = float(finite.mean()) if len(finite) > 0 else float("-inf")
+        record["std"] = float(finite.std()) if len(finite) > 0 else 0.0
+        record["avg_age"] = float(self.ages.mean())
+        record["modules"] = float(self.modules.mean())
+        record["std_modules"] = float(self.modules.std())
+
+        vectors = {"fitness": self.fitnesses, "age": self.ages, "modules": self.modules, None: population}
+        for name, (key, function) in self.metrics.items():
+            record[name] = function(vectors[key])
+        return record
+
+    def best(self, k: int) -> list:
+        # Reuses the top-k of the last compile if possible, the population is unchanged until the next step
+        if k <= len(self.top) or len(self.top) == len(self.population):
+            return self.top[:k]
+        return [self.population[i] for i in top_k_indices(self.fitnesses, k)]
+
+
+class JsonlStreamWriter:
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, record: dict):
+        with open(self.path, "a") as file:
+            file.write(json.dumps(record, default=float) + "\n")
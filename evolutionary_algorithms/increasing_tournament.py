@@ -38,15 +38,15 @@ class IncreasingTournament(AgeFitnessPareto):
                 self.tournament_size = self.calculate_tournament_size(gen)
                 gens_since_increase = 0
                 self.toolbox.register(
-                    "select", pareto_tournament_selection, tournament_size=self.tournament_size)
+                    "select", pareto_tournament_selection, tournament_size=self.tournament_size,
+                    fit_attr=self.selection_attr)
             else:
                 gens_since_increase += 1
             self.step(elitism)
             print(self.logbook.stream)
 
         if close_envs:
-            for evaluator in self.evaluators:
-                evaluator.close_env()
+            self.pool.close()
 
     def reset(self, population_size: int):
         super().reset(population_size)
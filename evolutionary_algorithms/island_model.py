@@ -0,0 +1,176 @@
+import pickle
+import queue
+import multiprocessing
+from deap import tools
+import numpy as np
+
+from robot.individual import Individual
+from robot.genome_codec import encode_batch, decode_batch
+from evolutionary_algorithms.coevolution import Coevolution
+from evolutionary_algorithms.generation_summary import top_k_indices, QUANTILES, QUANTILE_NAMES
+from run_config import RunConfig
+from seeding import derive_seed
+import config
+
+
+def ring_topology(n: int) -> dict:
+    return {i: [(i + 1) % n] for i in range(n)}
+
+
+def fully_connected_topology(n: int) -> dict:
+    return {i: [j for j in range(n) if j != i] for i in range(n)}
+
+
+TOPOLOGIES = {"ring": ring_topology, "fully connected": fully_connected_topology}
+
+
+def receive_migrants(ea: Coevolution, immigrants: list[Individual]):
+    # Immigrants replace the individuals with the lowest fitness
+    if len(immigrants) == 0:
+        return
+    fitnesses = np.array([ind.fitness for ind in ea.population])
+    worst = top_k_indices(-fitnesses, len(immigrants))
+    for i, ind in zip(worst, immigrants):
+        ea.population[i] = ind
+    ea.summary.compile(ea.population)  # Elites of the next step are taken from the summary
+
+
+def run_island(island: int, ea_class: type[Coevolution], parameters: dict, pop_size: int, generations: int,
+               elitism: int, migration_interval: int, n_migrants: int, terrain: str,
+               inbox: multiprocessing.Queue, neighbours: list[multiprocessing.Queue],
+               results: multiprocessing.Queue):
+    ea = ea_class(**parameters)
+    ea.run_config = RunConfig(terrain=terrain, seed=derive_seed(config.SEED, "island", island))  # Each island evolves its own robots
+    ea.elitism = elitism
+    ea.generations = generations
+    ea.reset(pop_size)
+    print(f"[Island {island}]", ea.logbook.stream)
+    for gen in range(1, generations):
+        if ea.interrupted:
+            break
+        ea.step(elitism)
+        print(f"[Island {island}]", ea.logbook.stream)
+
+        if gen % migration_interval == 0:
+            migrants = encode_batch(ea.summary.best(n_migrants))
+            for neighbour in neighbours:
+                neighbour.put(migrants)
+            immigrants = []
+            while True:  # Migration is asynchronous, only what has arrived so far is used
+                try:
+                    immigrants += decode_batch(inbox.get_nowait())
+                except queue.Empty:
+                    break
+            receive_migrants(ea, immigrants)
+    ea.pool.close()
+
+    # Pickled once at the end so the main process does not depend on the island's evaluators
+    results.put((island, pickle.dumps({
+        "spec": ea.spec_dict(),
+        "logbook": ea.logbook,
+        "hall_of_fame": ea.hall_of_fame,
+        "fitnesses_of_each_gen": ea.fitnesses_of_each_gen,
+        "best_of_each_gen": ea.best_of_each_gen,
+        "population": ea.population,
+        "fitness_and_ages_of_top20_per_gen": ea.fitness_and_ages_of_top20_per_gen,
+        "diversity_features": ea.diversity_features,
+        "joint_tables": ea.joint_tables})))
+
+
+class IslandModel:
+    def __init__(self, ea_class: type[Coevolution], parameters: dict, n_islands: int, migration_interval: int = 10,
+                 n_migrants: int = 2, topology: str = "ring", terrain: str = None):
+        self.ea_class = ea_class
+        self.parameters = parameters  # Keyword arguments of ea_class, parallel_processes is per island
+        self.n_islands = n_islands
+        self.migration_interval = migration_interval
+        self.n_migrants = n_migrants
+        self.topology = topology
+        self.terrain = terrain
+        self.island_specs = []
+        self.island_logbooks = []
+
+    def spec_dict(self) -> dict:
+        spec_dict = dict(self.island_specs[0]) if len(self.island_specs) > 0 else {}
+        spec_dict["population_size"] = self.population_size
+        spec_dict["islands"] = self.n_islands
+        spec_dict["migration interval"] = self.migration_interval
+        spec_dict["migrants"] = self.n_migrants
+        spec_dict["topology"] = self.topology
+        return spec_dict
+
+    def run(self, population_size: int, n_generations: int, elitism: int = 0):
+        # population_size is per island
+        self.population_size = population_size
+        self.generations = n_generations
+        context = multiprocessing.get_context("spawn")  # Forking after unity/grpc threads have started is unsafe
+        inboxes = [context.Queue() for _ in range(self.n_islands)]
+        results = context.Queue()
+        neighbours = TOPOLOGIES[self.topology](self.n_islands)
+
+        processes = []
+        for island in range(self.n_islands):
+            process = context.Process(target=run_island, args=(
+                island, self.ea_class, self.parameters, population_size, n_generations, elitism,
+                self.migration_interval, self.n_migrants, self.terrain, inboxes[island],
+                [inboxes[i] for i in neighbours[island]], results))
+            processes.append(process)
+            process.start()
+
+        island_results = [None] * self.n_islands
+        for _ in range(self.n_islands):
+            island, result = results.get()
+            island_results[island] = pickle.loads(result)
+        for process in processes:
+            process.join()
+        self.merge(island_results)
+
+    def merge(self, island_results: list[dict]):
+        # Combines the islands into the same attributes as an EA so evolve.save_results can be used
+        self.island_specs = [r["spec"] for r in island_results]
+        self.island_logbooks = [r["logbook"] for r in island_results]
+        self.population = [ind for r in island_results for ind in r["population"]]
+        self.hall_of_fame = tools.HallOfFame(island_results[0]["hall_of_fame"].maxsize)
+        for r in island_results:
+            self.hall_of_fame.update(r["hall_of_fame"])
+
+        n_gens = min(len(r["logbook"]) for r in island_results)
+        self.fitnesses_of_each_gen = []
+        self.best_of_each_gen = []
+        self.fitness_and_ages_of_top20_per_gen = []
+        self.diversity_features = []
+        self.joint_tables = []
+        self.logbook = tools.Logbook()
+        self.logbook.header = "gen", "avg_age", "modules", "min", "median", "max", "time"
+        for gen in range(n_gens):
+            fitnesses = [f for r in island_results for f in r["fitnesses_of_each_gen"][gen]]
+            self.fitnesses_of_each_gen.append(fitnesses)
+            self.best_of_each_gen.append(max((r["best_of_each_gen"][gen] for r in island_results),
+                                             key=lambda ind: ind.fitness))
+            top = sorted((fa for r in island_results for fa in r["fitness_and_ages_of_top20_per_gen"][gen]),
+                         key=lambda fa: fa[0], reverse=True)
+            self.fitness_and_ages_of_top20_per_gen.append(top[:20])
+            self.diversity_features.append([f for r in island_results for f in r["diversity_features"][gen]])
+            self.joint_tables.append([t for r in island_results for t in r["joint_tables"][gen]])
+
+            island_records = [r["logbook"][gen] for r in island_results]
+            sizes = np.array([len(r["fitnesses_of_each_gen"][gen]) for r in island_results])
+            weights = sizes / sizes.sum()
+            modules = np.array([r["modules"] for r in island_records])
+            std_modules = np.array([r["std_modules"] for r in island_records])
+            average_modules = float(np.sum(weights * modules))
+            fitnesses = np.asarray(fitnesses, dtype=np.float64)
+            record = {name: float(value) for name, value in zip(QUANTILE_NAMES, np.quantile(fitnesses, QUANTILES))}
+            record["avg"] = float(fitnesses.mean())
+            record["std"] = float(fitnesses.std())
+            record["avg_age"] = float(np.sum(weights * [r["avg_age"] for r in island_records]))
+            record["modules"] = average_modules
+            record["std_modules"] = float(np.sqrt(np.sum(weights * (std_modules ** 2 + modules ** 2))
+                                                  - average_modules ** 2))
+            self.logbook.record(gen=gen, time=max(r["time"] for r in island_records), **record)
+
+    def save(self, folder: str):
+        from evolve import save_results  # Not imported by the island processes, they only need their EA
+        save_results(self, folder)
+        with open(f"{folder}/island_logbooks.pickle", "wb") as file:
+            pickle.dump(self.island_logbooks, file)
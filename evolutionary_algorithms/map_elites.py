@@ -0,0 +1,179 @@
+import os
+import time
+from collections.abc import Callable
+import numpy as np
+from deap import tools
+
+import config
+from robot.individual import Individual
+from robot.genome_codec import GENOME_DTYPE, to_records, from_records
+from controllers.controller import Controller
+from evolutionary_algorithms.coevolution import Coevolution
+from seeding import seed_random
+
+# One niche per number of body joints, limb joints and limb pairs (see Individual.get_diversity_features)
+ARCHIVE_SHAPE = (config.MAX_MODULES_PYTHON + 1, config.MAX_MODULES_PYTHON + 1, config.MAX_MODULES_PYTHON // 2 + 1)
+
+
+class GridArchive:
+    # Best individual of every niche in dense arrays, the niche of a descriptor is its position in the grid.
+    # The elites are genome codec records, so with a folder the archive is two memory-mapped .npy files that
+    # are written in place and can be opened by other processes while the run is going
+    def __init__(self, shape: tuple = ARCHIVE_SHAPE, folder: str = None):
+        self.shape = tuple(shape)
+        self.size = int(np.prod(self.shape))
+        self.folder = folder
+        if folder is None:
+            self.fitness = np.full(self.size, -np.inf)
+            self.genomes = np.zeros(self.size, dtype=GENOME_DTYPE)
+        elif os.path.exists(f"{folder}/fitness.npy"):  # Continues a checkpointed archive
+            self.fitness = np.load(f"{folder}/fitness.npy", mmap_mode="r+")
+            self.genomes = np.load(f"{folder}/genomes.npy", mmap_mode="r+")
+            if self.fitness.shape != (self.size,):
+                raise ValueError(f"The archive in {folder} has {len(self.fitness)} niches, not {self.size}")
+        else:
+            os.makedirs(folder, exist_ok=True)
+            self.fitness = np.lib.format.open_memmap(f"{folder}/fitness.npy", mode="w+", dtype=np.float64,
+                                                     shape=(self.size,))
+            self.fitness[:] = -np.inf
+            self.genomes = np.lib.format.open_memmap(f"{folder}/genomes.npy", mode="w+", dtype=GENOME_DTYPE,
+                                                     shape=(self.size,))
+
+    @staticmethod
+    def load(folder: str, shape: tuple = ARCHIVE_SHAPE):
+        # Read-only view of a saved archive, e.g. for plots while the run is going
+        archive = GridArchive.__new__(GridArchive)
+        archive.shape, archive.size, archive.folder = tuple(shape), int(np.prod(shape)), folder
+        archive.fitness = np.load(f"{folder}/fitness.npy", mmap_mode="r")
+        archive.genomes = np.load(f"{folder}/genomes.npy", mmap_mode="r")
+        return archive
+
+    def niches(self, descriptors: np.ndarray) -> np.ndarray:
+        # Flat niche index of every descriptor, descriptors outside the grid go to the nearest edge
+        descriptors = np.clip(np.asarray(descriptors, dtype=np.int64), 0, np.array(self.shape) - 1)
+        return np.ravel_multi_index(descriptors.T, self.shape)
+
+    def add(self, individuals: list[Individual]) -> int:
+        # Inserts a batch, each niche keeps the best of its current elite and the individuals that fall into it.
+        # Returns the number of niches that got a new elite
+        if len(individuals) == 0:
+            return 0
+        niches = self.niches([ind.get_diversity_features() for ind in individuals])
+        fitnesses = np.array([ind.fitness for ind in individuals], dtype=np.float64)
+        order = np.argsort(-fitnesses, kind="stable")
+        niches, first = np.unique(niches[order], return_index=True)  # Best of the batch in every niche
+        best = order[first]
+        improved = fitnesses[best] > self.fitness[niches]
+        niches, best = niches[improved], best[improved]
+        if len(best) > 0:
+            self.fitness[niches] = fitnesses[best]
+            self.genomes[niches] = to_records([individuals[i] for i in best.tolist()])
+        return len(best)
+
+    def filled(self) -> np.ndarray:
+        return np.flatnonzero(np.isfinite(self.fitness))
+
+    def sample(self, n: int, controller_class: type[Controller]) -> list[Individual]:
+        # Elites of n niches drawn uniformly from the filled ones
+        filled = self.filled()
+        if len(filled) == 0:
+            raise ValueError("The archive is empty, no niche has an elite to sample")
+        return from_records(self.genomes[np.random.choice(filled, n)], controller_class)
+
+    def elites(self, controller_class: type[Controller]) -> list[Individual]:
+        return from_records(self.genomes[self.filled()], controller_class)
+
+    def stats(self) -> dict:
+        filled = self.filled()
+        fitnesses = self.fitness[filled]
+        return {"niches": len(filled), "coverage": len(filled) / self.size,
+                "qd_score": float(fitnesses.sum()), "archive_max": float(fitnesses.max()) if len(filled) else np.nan}
+
+    def flush(self):
+        # Checkpoint, memory-mapped arrays are written to disk
+        if isinstance(self.fitness, np.memmap):
+            self.fitness.flush()
+            self.genomes.flush()
+
+    def save(self, folder: str):
+        os.makedirs(folder, exist_ok=True)
+        np.save(f"{folder}/fitness.npy", self.fitness)
+        np.save(f"{folder}/genomes.npy", self.genomes)
+
+
+class MapElites(Coevolution):
+    # Parents are elites drawn uniformly from the filled niches of a grid archive over the body descriptors,
+    # every generation population_size offspring are evaluated in one batch and inserted into the archive.
+    # The population in the logbook is the offspring of the generation, the archive columns describe the archive
+    def __init__(self, evaluation_func: Callable[[Individual], float], controller_class: type[Controller],
+                 controller_mutation_rate: float, controller_mutation_sigma: float, body_mutation_rate: float,
+                 create_simple: bool, parallel_processes: int = 1, no_graphics: bool = True,
+                 archive_shape: tuple = ARCHIVE_SHAPE, archive_folder: str = None, checkpoint_interval: int = 10):
+        super().__init__(evaluation_func, controller_class, controller_mutation_rate, controller_mutation_sigma,
+                         body_mutation_rate, create_simple, parallel_processes=parallel_processes,
+                         no_graphics=no_graphics)
+        self.controller_class = controller_class
+        self.archive_shape = tuple(archive_shape)
+        # Memory-mapped archives if set, one subfolder per run of the EA (e.g. replicates of evolve_n_times),
+        # continued if it already exists
+        self.archive_folder = archive_folder
+        self.checkpoint_interval = checkpoint_interval
+        self.archive = None
+        self.runs = 0
+
+    def spec_dict(self) -> dict:
+        spec_dict = super().spec_dict()
+        spec_dict["evolution"] = "map-elites"
+        spec_dict["archive shape"] = self.archive_shape
+        return spec_dict
+
+    def add_records(self, record: dict):
+        if self.archive is not None:
+            record.update(self.archive.stats())
+
+    def update_archive(self, inds: list[Individual]):
+        with self.profiler.phase("archive"):
+            self.archive.add(inds)
+            if self.generation % self.checkpoint_interval == 0:
+                self.archive.flush()
+
+    def reset(self, population_size: int):
+        folder = f"{self.archive_folder}/{self.runs}" if self.archive_folder is not None else None
+        self.runs += 1
+        self.archive = GridArchive(self.archive_shape, folder)
+        if len(self.archive.filled()) > 0:  # Continued archive, its elites are the first population
+            self.toolbox.register("population", self.archive.sample, controller_class=self.controller_class)
+        else:
+            self.toolbox.register("population", tools.initRepeat, list, self.toolbox.individual)
+        super().reset(population_size)
+
+    def step(self, elitism: int = 0):
+        # elitism is not used, the archive keeps every elite
+        timer = time.time()
+        self.generation += 1
+        self.profiler.start_generation(self.generation)
+        seed_random(self.run_config.random_seed, self.generation)
+        with self.profiler.phase("select"):
+            if len(self.archive.filled()) > 0:
+                offspring = self.archive.sample(self.population_size, self.controller_class)
+            else:  # No robot got into the archive yet, e.g. all were ruled out by skip_below
+                parents = np.random.choice(len(self.population), self.population_size)
+                offspring = [self.toolbox.clone(self.population[i]) for i in parents.tolist()]
+
+        with self.profiler.phase("mutate"):
+            self.toolbox.mutate_controllers(offspring)
+            for i, ind in enumerate(offspring):
+                seed_random(self.run_config.random_seed, self.generation, i)  # Independent of the other offspring
+                self.toolbox.mutate_body(ind)
+        with self.profiler.phase("retune"):
+            self.retune(offspring)
+
+        self.population[:] = offspring
+        with self.profiler.phase("evaluate"):
+            self.evaluate_population()
+        self.update_archive(self.population)
+        self.record_generation(timer)
+
+    def run(self, population_size: int, n_generations: int, elitism: int = 0, close_envs: bool = True):
+        super().run(population_size, n_generations, elitism, close_envs)
+        self.archive.flush()
@@ -0,0 +1,117 @@
+import time
+import numpy as np
+
+import config
+from robot.individual import Individual
+
+
+class BehaviourIndex:
+    # Growing set of behaviour descriptors with k nearest neighbour queries. The KD-tree only covers the
+    # behaviours up to the last rebuild, newer ones are searched brute force until there are rebuild_fraction
+    # as many, so adding is cheap and the tree is rebuilt a logarithmic number of times
+    def __init__(self, dimensions: int = config.BEHAVIOUR_SAMPLES, rebuild_fraction: float = 0.1,
+                 min_rebuild: int = 256):
+        self.dimensions = dimensions
+        self.behaviours = np.empty((1024, dimensions))
+        self.size = 0
+        self.tree = None
+        self.indexed = 0  # Behaviours in the tree
+        self.rebuild_fraction = rebuild_fraction
+        self.min_rebuild = min_rebuild
+        self.rebuilds = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, behaviours: np.ndarray):
+        behaviours = np.asarray(behaviours, dtype=np.float64).reshape(-1, self.dimensions)
+        if self.size + len(behaviours) > len(self.behaviours):
+            capacity = max(2 * len(self.behaviours), self.size + len(behaviours))
+            grown = np.empty((capacity, self.dimensions))
+            grown[:self.size] = self.behaviours[:self.size]
+            self.behaviours = grown
+        self.behaviours[self.size:self.size + len(behaviours)] = behaviours
+        self.size += len(behaviours)
+        if self.size - self.indexed > max(self.min_rebuild, self.rebuild_fraction * self.indexed):
+            self.rebuild()
+
+    def rebuild(self):
+        from scipy.spatial import cKDTree  # Only needed for novelty search
+        self.tree = cKDTree(self.behaviours[:self.size].copy())
+        self.indexed = self.size
+        self.rebuilds += 1
+
+    def nearest(self, behaviours: np.ndarray, k: int) -> np.ndarray:
+        # Distances to the k nearest behaviours of every row, padded with inf if there are fewer than k
+        behaviours = np.asarray(behaviours, dtype=np.float64).reshape(-1, self.dimensions)
+        distances = [np.full((len(behaviours), k), np.inf)]
+        if self.tree is not None:
+            tree_distances, _ = self.tree.query(behaviours, k=min(k, self.indexed))
+            distances.append(tree_distances.reshape(len(behaviours), -1))
+        if self.size > self.indexed:
+            pending = self.behaviours[self.indexed:self.size]
+            distances.append(np.linalg.norm(behaviours[:, None, :] - pending[None, :, :], axis=2))
+        distances = np.concatenate(distances, axis=1)
+        return np.partition(distances, k - 1, axis=1)[:, :k]
+
+
+class NoveltySearch:
+    # Novelty of an individual is the mean distance of its behaviour to the k nearest behaviours of the archive
+    # and the individuals scored with it. After scoring, add_per_batch of the most novel behaviours are archived
+    # (all of them if None). Set with EA.use_novelty, selection then uses the novelty instead of the fitness
+    def __init__(self, k: int = 15, add_per_batch: int = None, dimensions: int = config.BEHAVIOUR_SAMPLES):
+        self.k = k
+        self.add_per_batch = add_per_batch
+        self.index = BehaviourIndex(dimensions)
+        self.seconds = 0.0  # Spent since the last take_stats
+        self.novelties = []
+
+    def spec_dict(self) -> dict:
+        return {"novelty k": self.k, "novelty archived per batch": self.add_per_batch}
+
+    def score(self, inds: list[Individual], archived: bool = False) -> np.ndarray:
+        # Individuals without a behaviour (not evaluated yet) get novelty 0. With archived, the individuals can
+        # already be in the archive (e.g. parents scored again against the grown archive), an archived behaviour
+        # equal to their own is then not a neighbour, and the novelties are not part of the avg_novelty stat
+        start = time.perf_counter()
+        described = [ind for ind in inds if getattr(ind, "behaviour", None) is not None]
+        novelties = np.zeros(len(described))
+        if len(described) > 0:
+            behaviours = np.array([ind.behaviour for ind in described], dtype=np.float64)
+            batch = np.linalg.norm(behaviours[:, None, :] - behaviours[None, :, :], axis=2)
+            np.fill_diagonal(batch, np.inf)  # Not its own neighbour
+            if archived:
+                archive = np.sort(self.index.nearest(behaviours, self.k + 1), axis=1)
+                archive = np.where(archive[:, :1] == 0, archive[:, 1:], archive[:, :-1])
+            else:
+                archive = self.index.nearest(behaviours, self.k)
+            distances = np.concatenate([archive, batch], axis=1)
+            k = min(self.k, len(self.index) - archived + len(described) - 1)
+            if k > 0:
+                nearest = np.partition(distances, k - 1, axis=1)[:, :k]
+                novelties = nearest.mean(axis=1)
+        for ind in inds:
+            ind.novelty = 0.0
+        for ind, novelty in zip(described, novelties.tolist()):
+            ind.novelty = novelty
+        if not archived:
+            self.novelties += novelties.tolist()
+        self.seconds += time.perf_counter() - start
+        return novelties
+
+    def add(self, inds: list[Individual]):
+        described = [ind for ind in inds if getattr(ind, "behaviour", None) is not None]
+        if self.add_per_batch is not None:
+            described = sorted(described, key=lambda ind: ind.novelty, reverse=True)[:self.add_per_batch]
+        if len(described) > 0:
+            start = time.perf_counter()
+            self.index.add([ind.behaviour for ind in described])
+            self.seconds += time.perf_counter() - start
+
+    def take_stats(self) -> dict:
+        stats = {"novelty_archive": len(self.index),
+                 "avg_novelty": float(np.mean(self.novelties)) if len(self.novelties) > 0 else 0.0,
+                 "novelty_seconds": self.seconds}
+        self.seconds = 0.0
+        self.novelties = []
+        return stats
@@ -1,19 +1,18 @@
 import time
+import numpy as np
 from collections.abc import Callable
 from deap import base
 from deap import tools
-from tqdm import tqdm
-import numpy as np
-import queue
-from multiprocessing import (
-    connection,
-)  # Has to be here to avoid threading import bug...
-from threading import Thread
 
-import config
+from run_config import RunConfig, SKIPPED_FITNESS
+from seeding import seed_random
 from robot.individual import Individual
+from robot.morphology_library import morphology_library
 from controllers.controller import Controller
 from evaluation.evaluator import Evaluator
+from evaluation.evaluator_pool import EvaluatorPool
+from evolutionary_algorithms.generation_summary import GenerationSummary
+from evolutionary_algorithms.profiler import PhaseProfiler
 
 
 class EA:
@@ -25,24 +24,23 @@ class EA:
         self.body_mutation = 0
         self.tournament_size = tournament_size
         self.toolbox = base.Toolbox()
-        self.toolbox.register("individual", Individual, controller_class, json_path=robot_config_path)
+        # The json is parsed once, every individual is stamped out from the same template
+        self.toolbox.register("individual", morphology_library.create, controller_class, robot_config_path)
         self.toolbox.register("population", tools.initRepeat, list, self.toolbox.individual)
         self.toolbox.register("evaluate", evaluation_func)
         self.toolbox.register("mutate_controller",
                               Individual.mutate_controller,
                               mutation_rate=mutation_rate,
                               mutation_sigma=mutation_sigma)
+        self.toolbox.register("mutate_controllers",  # Every offspring of a generation at once
+                              Individual.mutate_controllers,
+                              mutation_rate=mutation_rate,
+                              mutation_sigma=mutation_sigma)
         self.toolbox.register("select", tools.selTournament, tournsize=tournament_size)
         self.toolbox.register("get_best", tools.selBest, fit_attr="fitness")
 
-        self.stats = tools.Statistics(key=lambda ind: ind.fitness)
-        self.stats.register("avg", np.mean)
-        self.stats.register("std", np.std)
-        self.stats.register("min", np.min)
-        self.stats.register("q1", np.quantile, q=0.25)
-        self.stats.register("median", np.median)
-        self.stats.register("q3", np.quantile, q=0.75)
-        self.stats.register("max", np.max)
+        self.summary = GenerationSummary(top_k=20)
+        self.writers = []  # Streaming writers, get every logbook record
 
         self.logbook = tools.Logbook()
         self.logbook.header = "gen", "avg_age", "modules", "min", "median", "max", "time"
@@ -52,125 +50,300 @@ class EA:
         self.population = []
         self.parallel_processes = parallel_processes
         self.generation = 0
-        self.evaluators = [Evaluator(no_graphics=no_graphics, editor_mode=False) for _ in range(parallel_processes)]
+        self.pool = EvaluatorPool(parallel_processes, no_graphics=no_graphics, editor_mode=False)
+        self.evaluators = self.pool.evaluators
+        self.run_config = RunConfig()
+        # Unity starts while the population is created, only if the evaluation uses it
+        self.prewarm = evaluation_func is Evaluator.evaluate
+        self.fitness_cache = None  # Set to a FitnessCache to skip simulating genomes that are already evaluated
+        self.retuner = None  # Set to a ControllerRetuner to tune the controllers of new bodies before they compete
+        self.novelty = None  # Set with use_novelty
+        self.warm_start = None  # Set to a WarmStart to begin with individuals of earlier runs
+        self.racing = None  # Set to a RacingReevaluator to re-evaluate the elites while their ranking is uncertain
+        self.elite_archive = None  # Set to an EliteArchive to keep the k best distinct robots of the run
+        self.selection_attr = "fitness"
+        self.collision_hits = 0  # Of the individuals evaluated since the last generation
+        self.clean_up_total = 0
+        self.tail_latency = 0.0
+        self.profiler = PhaseProfiler()  # Replace to dump profiles of some generations or track memory
         self.diversity_features = []
         self.joint_tables = []
         self.fitnesses_of_each_gen = []
         self.fitness_and_ages_of_top20_per_gen = []
+        self.terrain_fitnesses_of_each_gen = []
         self.best_of_each_gen = []
         self.interrupted = False
 
     def spec_dict(self) -> dict:
-        return {"evolution": "only_controller",
-                "controller mutation": self.controller_mutation,
-                "controller sigma": self.controller_sigma,
-                "body mutation": self.body_mutation,
-                "create simple": False,
-                "elitism": self.elitism,
-                "tournament size": self.tournament_size,
-                "population_size": self.population_size,
-                "generations": self.generations,
-                "evaluation steps": config.EVALUATION_STEPS}
+        spec_dict = {"evolution": "only_controller",
+                     "controller mutation": self.controller_mutation,
+                     "controller sigma": self.controller_sigma,
+                     "body mutation": self.body_mutation,
+                     "create simple": False,
+                     "elitism": self.elitism,
+                     "tournament size": self.tournament_size,
+                     "population_size": self.population_size,
+                     "generations": self.generations,
+                     **self.run_config.spec_dict()}
+        if self.warm_start is not None:
+            spec_dict.update(self.warm_start.spec_dict())
+        if self.retuner is not None:
+            spec_dict.update(self.retuner.spec_dict())
+        if self.racing is not None:
+            spec_dict.update(self.racing.spec_dict())
+        if self.elite_archive is not None:
+            spec_dict.update(self.elite_archive.spec_dict())
+        if self.novelty is not None:
+            spec_dict["selection"] = "novelty"
+            spec_dict.update(self.novelty.spec_dict())
+        autotuner = getattr(self.pool, "autotuner", None)
+        if autotuner is not None:
+            spec_dict["parallel processes"] = self.pool.size
+            spec_dict["autotuned processes"] = autotuner.best if autotuner.best is not None else self.pool.active
+        return spec_dict
+
+
+    def use_novelty(self, novelty):
+        # Novelty search, selection uses the novelty of the individuals (see NoveltySearch) instead of the fitness
+        self.novelty = novelty
+        self.selection_attr = "novelty"
+        select = self.toolbox.select
+        self.toolbox.register("select", select.func, *select.args, **{**select.keywords, "fit_attr": "novelty"})
+
+    def use_pool(self, pool: EvaluatorPool):
+        # Shares an evaluator pool with other runs instead of having its own
+        self.pool.close()
+        self.pool = pool
+        self.evaluators = pool.evaluators
+        self.parallel_processes = pool.size
+
+    def evaluate(self, inds: list[Individual]):
+        scored = inds
+        for ind in inds:  # Counted once, after the mutations that made the individual
+            self.collision_hits += getattr(ind, "collision_hits", 0)
+            ind.collision_hits = 0
+        if self.racing is not None:
+            inds = self.racing.needs_evaluation(inds)
+        if self.fitness_cache is not None:
+            inds = self.apply_cached_fitnesses(inds)
+            names = [[module.name for module in ind.modules] for ind in inds]
+        # Baldwinian retuning evaluates the retuned controllers, the genome keeps the inherited ones
+        evaluated = [ind.retuned if getattr(ind, "retuned", None) is not None else ind for ind in inds]
+        fitnesses = self.simulate(evaluated)
+        for i, (ind, fitness) in enumerate(zip(inds, fitnesses)):
+            if evaluated[i] is not ind:
+                ind.retuned = None
+                ind.behaviour = evaluated[i].behaviour
+                if hasattr(evaluated[i], "terrain_fitnesses"):
+                    ind.terrain_fitnesses = evaluated[i].terrain_fitnesses
+            if fitness is not None:  # None if the evaluation was interrupted
+                ind.fitness = fitness
+                ind.reset_fitness_samples(fitness)
+                if self.fitness_cache is not None:
+                    kept = None
+                    if len(ind.modules) != len(names[i]):
+                        kept = [names[i].index(module.name) for module in ind.modules]
+                    self.fitness_cache.put(self.cache_keys[i], fitness, kept,
+                                           getattr(ind, "terrain_fitnesses", None), ind.behaviour)
+        self.interrupted = self.pool.interrupted
+        if self.novelty is not None:
+            self.novelty.score(scored)
+            self.novelty.add(inds)  # Cached genomes are already in the archive
+        self.tail_latency += getattr(self.pool, "tail_latency", 0.0)
+
+    def simulate(self, inds: list[Individual]) -> list[float]:
+        if self.run_config.terrains is not None:
+            return self.evaluate_terrains(inds)
+        return self.pool.evaluate(inds, self.toolbox.evaluate, build_path=self.run_config.build_path,
+                                  seed=self.run_config.seed, eval_steps=self.run_config.eval_steps)
+
+    def evaluate_terrains(self, inds: list[Individual]) -> list[float]:
+        # Fitness aggregated over every terrain of the run config, the terrains are evaluated in the same pool call.
+        # The fitness on each terrain is kept in ind.terrain_fitnesses, nan for skipped terrains
+        run_config = self.run_config
+        n_terrains = len(run_config.terrains)
+        per_terrain = [[None] * n_terrains for _ in inds]
+        pairs = [(i, t) for i in range(len(inds)) for t in range(n_terrains)]
+        if run_config.skip_below is not None and n_terrains > 1:
+            first = self.pool.evaluate(inds, self.toolbox.evaluate, build_path=run_config.build_paths[0],
+                                       seed=run_config.seed, eval_steps=run_config.eval_steps)
+            pairs = []
+            for i, fitness in enumerate(first):
+                per_terrain[i][0] = fitness
+                if fitness is not None and fitness < run_config.skip_below:  # Ruled out by the first terrain
+                    per_terrain[i][1:] = [np.nan] * (n_terrains - 1)
+                else:
+                    pairs += [(i, t) for t in range(1, n_terrains)]
+
+        # The other terrains evaluate copies, only the clean up on the first terrain changes the genome
+        copies = [inds[i] if t == 0 else inds[i].copy_genome() for i, t in pairs]
+        fitnesses = self.pool.evaluate(copies, self.toolbox.evaluate,
+                                       build_paths=[run_config.build_paths[t] for _, t in pairs],
+                                       seed=run_config.seed, eval_steps=run_config.eval_steps)
+        for (i, t), fitness in zip(pairs, fitnesses):
+            per_terrain[i][t] = fitness
 
+        aggregated = []
+        for ind, terrain_fitnesses in zip(inds, per_terrain):
+            if any(fitness is None for fitness in terrain_fitnesses):  # Interrupted
+                aggregated.append(None)
+                continue
+            ind.terrain_fitnesses = dict(zip(run_config.terrains, terrain_fitnesses))
+            if any(np.isnan(fitness) for fitness in terrain_fitnesses):  # Ranked below every robot that passed
+                aggregated.append(SKIPPED_FITNESS)
+            else:
+                aggregated.append(float(np.round(run_config.aggregate(terrain_fitnesses), 3)))
+        return aggregated
+
+    def retune(self, inds: list[Individual]):
+        # Only bodies changed by this generation's mutation, their age has been reset
+        if self.retuner is not None:
+            self.retuner.retune(self, [ind for ind in inds if ind.morph_age == 0])
+
+    def apply_cached_fitnesses(self, inds: list[Individual]) -> list[Individual]:
+        # Sets the fitness of already simulated genomes and returns the individuals left to evaluate
+        to_evaluate = []
+        self.cache_keys = []
+        for ind in inds:
+            key = self.fitness_cache.key(ind, *self.run_config.cache_context())
+            cached = self.fitness_cache.get(key)
+            if cached is None:
+                to_evaluate.append(ind)
+                self.cache_keys.append(key)
+                continue
+            fitness, kept, terrain_fitnesses, behaviour = cached
+            if kept is not None:  # Same clean up as after the original evaluation
+                ind.clean_up_genome([ind.modules[i].name for i in kept])
+            ind.fitness = fitness
+            ind.reset_fitness_samples(fitness)
+            ind.retuned = None  # The cached fitness is used instead
+            ind.behaviour = behaviour
+            if terrain_fitnesses is not None:
+                ind.terrain_fitnesses = terrain_fitnesses
+        return to_evaluate
 
     def evaluate_population(self):
-        if self.parallel_processes == 1:
-            try:
-                for ind in tqdm(self.population, desc="Evaluating Population"):
-                    ind.fitness = self.toolbox.evaluate(self.evaluators[0], ind)
-            except KeyboardInterrupt:
-                print("\nEvaluation interrupted.")
-                self.interrupted = True
-        else:
-            threads = []
-            try:
-                ind_queue = queue.Queue()
-                for g in self.population:
-                    ind_queue.put(g)
-
-                for i in range(self.parallel_processes):
-                    thread = Thread(target=self.evaluate_parallel, args=(ind_queue, self.evaluators[i]))
-                    threads.append(thread)
-                    thread.start()
-
-                for t in threads:
-                    t.join()
-
-            except KeyboardInterrupt:
-                print("\nEvaluation interrupted, wait for threads to terminate.")
-                self.interrupted = True
-                for t in tqdm(threads):
-                    t.join()
-
-        self.hall_of_fame.update(self.population)
-
-    def evaluate_parallel(self, ind_queue: queue.Queue, evaluator: Evaluator):
-        while not ind_queue.empty() and not self.interrupted:
-            ind = ind_queue.get()
-            ind.fitness = self.toolbox.evaluate(evaluator, ind)
+        self.evaluate(self.population)
+
+    def add_writer(self, writer):
+        self.writers.append(writer)
+
+    def record_generation(self, timer: float):
+        # Every statistic is computed from one summary of the population, timer is the start of the generation
+        if self.racing is not None and not self.interrupted:
+            with self.profiler.phase("race"):
+                self.racing.race(self, self.population)
+        with self.profiler.phase("stats"):
+            record = self.summary.compile(self.population)
+        with self.profiler.phase("bookkeeping"):
+            top = self.summary.top
+            self.hall_of_fame.update(top[:self.hall_of_fame.maxsize])
+            if self.elite_archive is not None:
+                self.elite_archive.add(self.population)
+                self.elite_archive.flush()
+            self.diversity_features.append([ind.get_diversity_features() for ind in self.population])
+            self.joint_tables.append([ind.build_joint_table() for ind in self.population])
+            self.fitnesses_of_each_gen.append(self.summary.fitnesses.tolist())
+            self.best_of_each_gen.append(top[0])
+            self.fitness_and_ages_of_top20_per_gen.append([[ind.fitness, ind.morph_age] for ind in top[:20]])
+            if self.run_config.terrains is not None:
+                self.record_terrains(record)
+        # Placements the python collision model repaired or rejected (hits of the model, not verified clean ups)
+        # and clean ups after unity skipped modules, since the last generation
+        clean_ups = sum(e.clean_ups for e in self.pool.evaluators)
+        record["collision_model_hits"] = self.collision_hits
+        record["clean_ups"] = clean_ups - self.clean_up_total
+        self.collision_hits, self.clean_up_total = 0, clean_ups
+        if self.retuner is not None:
+            record.update(self.retuner.take_stats())
+        if self.racing is not None:
+            record.update(self.racing.take_stats())
+        if self.elite_archive is not None:
+            record.update(self.elite_archive.take_stats())
+        if self.novelty is not None:
+            record.update(self.novelty.take_stats())
+        self.add_records(record)
+        record["tail_latency"] = self.tail_latency  # Evaluators waiting on the last evaluations of the generation
+        self.tail_latency = 0.0
+        if hasattr(self.pool, "live_envs"):
+            record["live_envs"] = self.pool.live_envs
+        record.update(self.profiler.end_generation(self.generation, self.population))
+        timer = time.time() - timer
+        self.logbook.record(gen=self.generation, time=timer, **record)
+        for writer in self.writers:
+            writer.write(self.logbook[-1])
+
+    def record_terrains(self, record: dict):
+        terrains = self.run_config.terrains
+        fitnesses = np.array([[getattr(ind, "terrain_fitnesses", {}).get(terrain, np.nan) for terrain in terrains]
+                              for ind in self.population], dtype=np.float64)
+        self.terrain_fitnesses_of_each_gen.append(fitnesses.tolist())
+        for t, terrain in enumerate(terrains):
+            if not np.all(np.isnan(fitnesses[:, t])):
+                record[f"max_{terrain}"] = float(np.nanmax(fitnesses[:, t]))
+                record[f"median_{terrain}"] = float(np.nanmedian(fitnesses[:, t]))
+
+    def add_records(self, record: dict):
+        # Subclasses add their own columns to the logbook record of the generation
+        pass
+
+    def update_archive(self, inds: list[Individual]):
+        # Subclasses with an archive insert the evaluated individuals, before the generation is recorded
+        pass
 
     def reset(self, population_size: int):
         timer = time.time()
         self.generation = 0
+        self.profiler.start_generation(self.generation)
         self.population_size = population_size
-        self.population = self.toolbox.population(n=population_size)
+        if self.prewarm and hasattr(self.pool, "prewarm"):
+            build_path = self.run_config.build_path
+            if self.run_config.terrains is not None:
+                build_path = self.run_config.build_paths[0]
+            self.pool.prewarm(build_path, self.run_config.seed)
+        seed_random(self.run_config.random_seed, "population")  # Selection and mutation only use the main thread
+        with self.profiler.phase("init"):
+            if self.warm_start is not None:
+                self.population, to_evaluate = self.warm_start.population(self, population_size)
+            else:
+                self.population = self.toolbox.population(n=population_size)
+                to_evaluate = self.population
 
         self.logbook = tools.Logbook()
         self.logbook.header = "gen", "avg_age", "modules", "min", "median", "max", "time"
         self.hall_of_fame = tools.HallOfFame(1)
+        if self.elite_archive is not None:
+            self.elite_archive.clear()
         self.diversity_features = []
         self.joint_tables = []
         self.fitnesses_of_each_gen = []
         self.best_of_each_gen = []
         self.fitness_and_ages_of_top20_per_gen = []
+        self.terrain_fitnesses_of_each_gen = []
 
-        self.evaluate_population()
-        self.diversity_features.append([ind.get_diversity_features() for ind in self.population])
-        self.joint_tables.append([ind.build_joint_table() for ind in self.population])
-        self.fitnesses_of_each_gen.append([ind.fitness for ind in self.population])
-        self.best_of_each_gen.append(self.toolbox.get_best(self.population, k=1)[0])
-        record = self.stats.compile(self.population)
-        timer = time.time() - timer
-        ages = [ind.morph_age for ind in self.population]
-        number_of_modules = [len(ind.modules) for ind in self.population]
-        average_age = np.mean(ages)
-        average_modules = np.mean(number_of_modules)
-        std_modules = np.std(number_of_modules)
-        self.logbook.record(gen=self.generation, avg_age=average_age, modules=average_modules, 
-                            std_modules=std_modules, time=timer, **record)
-        top20 = self.toolbox.get_best(self.population, k=20)
-        fitnesses_ages = [[ind.fitness, ind.morph_age] for ind in top20]
-        self.fitness_and_ages_of_top20_per_gen.append(fitnesses_ages)
-        
+        with self.profiler.phase("evaluate"):
+            self.evaluate(to_evaluate)
+        self.update_archive(self.population)
+        self.record_generation(timer)
 
     def step(self, elitism: int = 0):
         timer = time.time()
         self.generation += 1
-        offspring = self.toolbox.select(self.population, self.population_size - elitism)
-        offspring = list(map(self.toolbox.clone, offspring))
-        elites = self.toolbox.get_best(self.population, k=elitism)
+        self.profiler.start_generation(self.generation)
+        seed_random(self.run_config.random_seed, self.generation)
+        with self.profiler.phase("select"):
+            offspring = self.toolbox.select(self.population, self.population_size - elitism)
+        with self.profiler.phase("clone"):
+            offspring = list(map(self.toolbox.clone, offspring))
+            elites = self.summary.best(elitism)
 
-        for ind in offspring:
-            self.toolbox.mutate_controller(ind)
+        with self.profiler.phase("mutate"):
+            self.toolbox.mutate_controllers(offspring)
 
         self.population[:] = offspring + elites
-        self.evaluate_population()
-        self.diversity_features.append([ind.get_diversity_features() for ind in self.population])
-        self.joint_tables.append([ind.build_joint_table() for ind in self.population])
-        self.fitnesses_of_each_gen.append([ind.fitness for ind in self.population])
-        self.best_of_each_gen.append(self.toolbox.get_best(self.population, k=1)[0])
-        record = self.stats.compile(self.population)
-        timer = time.time() - timer
-        ages = [ind.morph_age for ind in self.population]
-        number_of_modules = [len(ind.modules) for ind in self.population]
-        average_age = np.mean(ages)
-        average_modules = np.mean(number_of_modules)
-        std_modules = np.std(number_of_modules)
-        self.logbook.record(gen=self.generation, avg_age=average_age, modules=average_modules,
-                             std_modules=std_modules, time=timer, **record)
-        top20 = self.toolbox.get_best(self.population, k=20)
-        fitnesses_ages = [[ind.fitness, ind.morph_age] for ind in top20]
-        self.fitness_and_ages_of_top20_per_gen.append(fitnesses_ages)
+        with self.profiler.phase("evaluate"):
+            self.evaluate_population()
+        self.record_generation(timer)
 
     def run(self, population_size: int, n_generations: int, elitism: int = 0, close_envs: bool = True):
         self.reset(population_size)
@@ -184,5 +357,4 @@ class EA:
             self.step(elitism)
             print(self.logbook.stream)
         if close_envs:
-            for evaluator in self.evaluators:
-                evaluator.close_env()
+            self.pool.close()
@@ -0,0 +1,143 @@
+import warnings
+import numpy as np
+
+from robot.individual import Individual
+
+
+class ControllerSpace:
+    # Controller parameters of a fixed morphology as one vector (the parameters of every module in order),
+    # scaled to the unit cube so the optimizers do not need to know the parameter ranges.
+    # Periodic parameters are wrapped into their range, the others are clipped
+    def __init__(self, template: Individual):
+        self.template = template
+        controller_class = template.controller_class
+        bounds = np.array([getattr(controller_class, f"allowable_{name}") for name in controller_class.PARAMETERS],
+                          dtype=np.float64)
+        if not np.all(np.isfinite(bounds)):
+            raise ValueError(f"{controller_class.__name__} has unbounded parameters, they can not be optimized")
+        self.n_modules = len(template.modules)
+        self.low = np.tile(bounds[:, 0], self.n_modules)
+        self.high = np.tile(bounds[:, 1], self.n_modules)
+        self.periodic = np.tile([name in controller_class.PERIODIC for name in controller_class.PARAMETERS],
+                                self.n_modules)
+        self.dimensions = len(self.low)
+
+    def to_vector(self, ind: Individual) -> np.ndarray:
+        parameters = np.array([module.controller.get_parameters() for module in ind.modules], dtype=np.float64)
+        return (parameters.ravel() - self.low) / (self.high - self.low)
+
+    def repair(self, x: np.ndarray) -> np.ndarray:
+        return np.where(self.periodic, np.mod(x, 1.0), np.clip(x, 0.0, 1.0))
+
+    def set_vector(self, ind: Individual, x: np.ndarray):
+        parameters = self.low + self.repair(x) * (self.high - self.low)
+        for module, module_parameters in zip(ind.modules, parameters.reshape(self.n_modules, -1).tolist()):
+            module.controller.set_parameters(module_parameters)
+
+    def to_individual(self, x: np.ndarray) -> Individual:
+        # Copy of the template with the controller parameters of x
+        ind = self.template.copy_genome()
+        self.set_vector(ind, x)
+        return ind
+
+
+class CMAES:
+    # Covariance matrix adaptation evolution strategy maximizing the fitness, every tell is one generation
+    # of CMA-ES so ask(n) can use as many samples as there are evaluators
+    def __init__(self, mean: np.ndarray, sigma: float = 0.3, seed: int = None):
+        self.dimensions = len(mean)
+        self.mean = np.array(mean, dtype=np.float64)
+        self.sigma = sigma
+        self.random = np.random.default_rng(seed)
+        self.covariance = np.eye(self.dimensions)
+        self.eigenvectors = np.eye(self.dimensions)
+        self.eigenvalues = np.ones(self.dimensions)  # Square roots of the eigenvalues of the covariance
+        self.path_sigma = np.zeros(self.dimensions)
+        self.path_covariance = np.zeros(self.dimensions)
+        self.expected_norm = np.sqrt(self.dimensions) * (1 - 1 / (4 * self.dimensions)
+                                                         + 1 / (21 * self.dimensions ** 2))
+        self.generation = 0
+
+    def ask(self, n: int) -> np.ndarray:
+        z = self.random.standard_normal((n, self.dimensions))
+        return self.mean + self.sigma * (z * self.eigenvalues) @ self.eigenvectors.T
+
+    def tell(self, xs: np.ndarray, fitnesses: list[float]):
+        n = self.dimensions
+        xs = np.asarray(xs, dtype=np.float64)
+        mu = max(1, len(xs) // 2)
+        weights = np.log(mu + 0.5) - np.log(np.arange(1, mu + 1))
+        weights /= weights.sum()
+        mu_eff = 1 / np.sum(weights ** 2)
+        c_c = (4 + mu_eff / n) / (n + 4 + 2 * mu_eff / n)
+        c_sigma = (mu_eff + 2) / (n + mu_eff + 5)
+        c_1 = 2 / ((n + 1.3) ** 2 + mu_eff)
+        c_mu = min(1 - c_1, 2 * (mu_eff - 2 + 1 / mu_eff) / ((n + 2) ** 2 + mu_eff))
+        damping = 1 + 2 * max(0.0, np.sqrt((mu_eff - 1) / (n + 1)) - 1) + c_sigma
+
+        best = np.argsort(-np.asarray(fitnesses, dtype=np.float64), kind="stable")[:mu]
+        steps = (xs[best] - self.mean) / self.sigma
+        step = weights @ steps
+        self.mean = self.mean + self.sigma * step
+        self.generation += 1
+
+        inverse_sqrt = self.eigenvectors @ np.diag(1 / self.eigenvalues) @ self.eigenvectors.T
+        self.path_sigma = ((1 - c_sigma) * self.path_sigma
+                           + np.sqrt(c_sigma * (2 - c_sigma) * mu_eff) * inverse_sqrt @ step)
+        path_norm = np.linalg.norm(self.path_sigma) / np.sqrt(1 - (1 - c_sigma) ** (2 * self.generation))
+        h_sigma = float(path_norm / self.expected_norm < 1.4 + 2 / (n + 1))
+        self.path_covariance = ((1 - c_c) * self.path_covariance
+                                + h_sigma * np.sqrt(c_c * (2 - c_c) * mu_eff) * step)
+        self.covariance = ((1 - c_1 - c_mu) * self.covariance
+                           + c_1 * (np.outer(self.path_covariance, self.path_covariance)
+                                    + (1 - h_sigma) * c_c * (2 - c_c) * self.covariance)
+                           + c_mu * (steps.T * weights) @ steps)
+        self.sigma *= np.exp(c_sigma / damping * (np.linalg.norm(self.path_sigma) / self.expected_norm - 1))
+
+        self.covariance = (self.covariance + self.covariance.T) / 2
+        eigenvalues, self.eigenvectors = np.linalg.eigh(self.covariance)
+        self.eigenvalues = np.sqrt(np.maximum(eigenvalues, 1e-20))
+
+
+class BayesianOptimizer:
+    # Gaussian process bayesian optimization with the bayesian-optimization package. The process is fitted once
+    # per batch, and the n points of a batch maximize the upper confidence bound with n exploration weights
+    # from exploit to explore, so the batch is not n times the same point
+    def __init__(self, dimensions: int, seed: int = None, kappa_range: tuple = (0.5, 10.0), restarts: int = 2):
+        from bayes_opt import BayesianOptimization  # Only needed for this optimizer
+        from sklearn.gaussian_process import GaussianProcessRegressor
+        from sklearn.gaussian_process.kernels import Matern
+        self.dimensions = dimensions
+        self.keys = [f"x{i:04d}" for i in range(dimensions)]  # Sorted like the keys of bayes_opt
+        self.optimizer = BayesianOptimization(f=None, pbounds={key: (0.0, 1.0) for key in self.keys},
+                                              random_state=seed, verbose=0)
+        # Same process as BayesianOptimization.suggest, which would fit it again for every point
+        self.gp = GaussianProcessRegressor(kernel=Matern(nu=2.5), alpha=1e-6, normalize_y=True,
+                                           n_restarts_optimizer=5, random_state=seed)
+        self.random = np.random.RandomState(seed)
+        self.kappa_range = kappa_range
+        self.restarts = restarts  # Local searches of the acquisition function per point, 10 in bayes_opt
+
+    def ask(self, n: int) -> np.ndarray:
+        from bayes_opt import UtilityFunction
+        from bayes_opt.util import acq_max
+        space = self.optimizer.space
+        if len(space) == 0:
+            return np.array([space.random_sample() for _ in range(n)])
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            self.gp.fit(space.params, space.target)
+        kappas = np.geomspace(*self.kappa_range, n) if n > 1 else [self.kappa_range[0]]
+        return np.array([acq_max(UtilityFunction(kind="ucb", kappa=kappa, xi=0.0).utility, self.gp,
+                                 space.target.max(), space.bounds, self.random, n_iter=self.restarts)
+                         for kappa in kappas], dtype=np.float64)
+
+    def tell(self, xs: np.ndarray, fitnesses: list[float]):
+        for x, fitness in zip(xs, fitnesses):
+            try:
+                self.optimizer.register(params=dict(zip(self.keys, x)), target=fitness)
+            except KeyError:  # Same point as an earlier one, bayes_opt only keeps the first
+                pass
+
+
+OPTIMIZERS = ("cmaes", "bayesian")
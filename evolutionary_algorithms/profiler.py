@@ -0,0 +1,95 @@
+import gc
+import os
+import time
+import pickle
+import cProfile
+import resource
+from contextlib import contextmanager
+
+from robot.individual import Individual
+from robot.module import Module
+from controllers.controller import Controller
+
+try:
+    from pyinstrument import Profiler as SamplingProfiler  # Optional, only needed for sampler="sampling"
+except ImportError:
+    SamplingProfiler = None
+
+
+def rss_mb() -> float:
+    # Current resident set size, falls back to the peak where /proc is not available
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if os.uname().sysname == "Darwin" else peak / 2 ** 10
+
+
+def live_objects() -> dict:
+    # Walks every object tracked by the garbage collector, so only done when memory is tracked
+    counts = {"individuals": 0, "modules_alive": 0, "controllers": 0}
+    for obj in gc.get_objects():
+        if isinstance(obj, Individual):
+            counts["individuals"] += 1
+        elif isinstance(obj, Module):
+            counts["modules_alive"] += 1
+        elif isinstance(obj, Controller):
+            counts["controllers"] += 1
+    return counts
+
+
+def record_mb(population: list[Individual]) -> float:
+    # Size of the mutation history (clones kept in record) of the population
+    return len(pickle.dumps([ind.record for ind in population], protocol=pickle.HIGHEST_PROTOCOL)) / 2 ** 20
+
+
+class PhaseProfiler:
+    def __init__(self, profile_generations: set = (), folder: str = ".", sampler: str = "cprofile",
+                 track_memory: bool = False):
+        # Phase timers are always on, profiler dumps only for profile_generations
+        if sampler == "sampling" and SamplingProfiler is None:
+            raise ImportError("pyinstrument is needed for the sampling profiler")
+        self.profile_generations = set(profile_generations)
+        self.folder = folder
+        self.sampler = sampler
+        self.track_memory = track_memory
+        self.times = {}
+        self.profiler = None
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] = self.times.get(name, 0.0) + time.perf_counter() - start
+
+    def start_generation(self, generation: int):
+        self.times = {}
+        if generation in self.profile_generations:
+            self.profiler = cProfile.Profile() if self.sampler == "cprofile" else SamplingProfiler()
+            if self.sampler == "cprofile":
+                self.profiler.enable()
+            else:
+                self.profiler.start()
+
+    def end_generation(self, generation: int, population: list[Individual]) -> dict:
+        # Stops a running profiler and returns the phase times (and memory) to record in the logbook
+        if self.profiler is not None:
+            os.makedirs(self.folder, exist_ok=True)
+            if self.sampler == "cprofile":
+                self.profiler.disable()
+                self.profiler.dump_stats(f"{self.folder}/profile_gen{generation}.prof")
+            else:
+                self.profiler.stop()
+                with open(f"{self.folder}/profile_gen{generation}.html", "w") as file:
+                    file.write(self.profiler.output_html())
+            self.profiler = None
+
+        record = {f"{name}_time": value for name, value in self.times.items()}
+        if self.track_memory:
+            record["rss_mb"] = rss_mb()
+            record["record_mb"] = record_mb(population)
+            record.update(live_objects())
+        return record
@@ -0,0 +1,119 @@
+from statistics import NormalDist
+import numpy as np
+
+from robot.individual import Individual
+from robot.genome_codec import genome_key
+
+
+class RacingReevaluator:
+    # Re-evaluates the individuals that would become elites or enter the hall of fame, and the competitors just
+    # behind them, until their confidence intervals separate, so noisy fitnesses do not decide the elites with a
+    # single lucky evaluation. Every round evaluates the racers whose interval still overlaps the other side once
+    # more, in one pool call, until the intervals separate or budget evaluations of the generation are spent.
+    # The fitness is the mean of the samples. Unity is not re-seeded, so repeated samples only differ by the
+    # nondeterminism of the simulation; Individual.evaluation_sample numbers them (the stand-in evaluator draws
+    # its noise from it). With a deterministic simulation the samples agree, and the race ends after one round.
+    # Individuals with one sample use the variance pooled over all re-evaluations, before the first
+    # re-evaluation their interval is unbounded (or prior_std wide)
+    def __init__(self, budget: int = 16, confidence: float = 0.95, max_samples: int = 8, competitors: int = None,
+                 prior_std: float = None):
+        self.budget = budget
+        self.confidence = confidence
+        self.z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        self.max_samples = max_samples
+        self.competitors = competitors  # As many as there are elites if None
+        self.prior_std = prior_std
+        self.pooled_m2 = 0.0  # Of every re-evaluated individual, for the pooled variance
+        self.pooled_dof = 0
+        self.evaluations = 0  # Spent since the last take_stats
+        self.rounds = 0
+        self.separated = 0
+        self.raced = set()
+
+    def spec_dict(self) -> dict:
+        return {"racing budget": self.budget, "racing confidence": self.confidence,
+                "racing max samples": self.max_samples, "racing competitors": self.competitors}
+
+    def needs_evaluation(self, inds: list[Individual]) -> list[Individual]:
+        # Raced individuals that are still the same robot keep their mean, evaluating them again would reset it
+        return [ind for ind in inds if getattr(ind, "fitness_samples", 0) < 2
+                or getattr(ind, "raced_key", None) != genome_key(ind)]
+
+    def half_width(self, ind: Individual) -> float:
+        if ind.fitness_samples >= 3:
+            variance = ind.fitness_variance
+        elif self.pooled_dof > 0:
+            variance = self.pooled_m2 / self.pooled_dof
+        elif self.prior_std is not None:
+            variance = self.prior_std ** 2
+        else:
+            return np.inf
+        return self.z * np.sqrt(variance / ind.fitness_samples)
+
+    def race(self, ea, population: list[Individual]):
+        n_elites = max(getattr(ea, "elitism", 0), ea.hall_of_fame.maxsize)
+        n_competitors = self.competitors if self.competitors is not None else n_elites
+        # The hall of fame stores copies, the same robot is raced once, as the individual of the population
+        racers = {}
+        for ind in list(population) + list(ea.hall_of_fame):
+            racers.setdefault(genome_key(ind), ind)
+        hall_of_fame = [racers[genome_key(ind)] for ind in ea.hall_of_fame]
+        racers = [ind for ind in racers.values() if np.isfinite(ind.fitness)]  # Not robots ruled out by skip_below
+        for ind in racers:
+            if getattr(ind, "fitness_samples", 0) == 0:  # E.g. warm started, the stored fitness is one sample
+                ind.reset_fitness_samples(ind.fitness)
+        remaining = self.budget
+        while remaining > 0:
+            ranked = sorted(racers, key=lambda ind: ind.fitness_mean, reverse=True)
+            elites = ranked[:n_elites]
+            competitors = ranked[n_elites:n_elites + n_competitors]
+            if len(competitors) == 0:
+                break
+            widths = {id(ind): self.half_width(ind) for ind in elites + competitors}
+            lowest_elite = min(ind.fitness_mean - widths[id(ind)] for ind in elites)
+            highest_competitor = max(ind.fitness_mean + widths[id(ind)] for ind in competitors)
+            uncertain = ([ind for ind in elites if ind.fitness_mean - widths[id(ind)] < highest_competitor]
+                         + [ind for ind in competitors if ind.fitness_mean + widths[id(ind)] > lowest_elite])
+            if len(uncertain) == 0:
+                self.separated += 1
+                break
+            uncertain = [ind for ind in uncertain if ind.fitness_samples < self.max_samples]
+            if len(uncertain) == 0:
+                break
+            # The widest intervals first if the budget does not cover every uncertain individual
+            uncertain = sorted(uncertain, key=lambda ind: widths[id(ind)], reverse=True)[:remaining]
+            if not self.sample(ea, uncertain):
+                return
+            remaining -= len(uncertain)
+            self.rounds += 1
+
+        if any(id(ind) in self.raced for ind in hall_of_fame):  # Re-sorted with the new means
+            ea.hall_of_fame.clear()
+            ea.hall_of_fame.update(hall_of_fame)
+        self.raced = set()
+
+    def sample(self, ea, inds: list[Individual]) -> bool:
+        # One more evaluation of each individual, False if it was interrupted
+        copies = []
+        for ind in inds:
+            copy = ind.copy_genome()
+            copy.evaluation_sample = ind.fitness_samples  # Sample 0 is the first evaluation
+            copies.append(copy)
+        fitnesses = ea.simulate(copies)
+        self.evaluations += len(copies)
+        if any(fitness is None for fitness in fitnesses):
+            return False
+        for ind, fitness in zip(inds, fitnesses):
+            m2 = ind.fitness_m2
+            ind.add_fitness_sample(fitness)
+            ind.raced_key = genome_key(ind)
+            self.pooled_m2 += ind.fitness_m2 - m2
+            self.pooled_dof += 1
+            self.raced.add(id(ind))
+        return True
+
+    def take_stats(self) -> dict:
+        stats = {"racing_evaluations": self.evaluations, "racing_rounds": self.rounds,
+                 "racing_separated": self.separated}
+        self.evaluations, self.rounds, self.separated = 0, 0, 0
+        return stats
@@ -0,0 +1,84 @@
+import numpy as np
+
+import config
+from robot.individual import Individual
+from evolutionary_algorithms.optimizers import ControllerSpace, CMAES
+from seeding import derive_seed
+
+RETUNE_MODES = ("lamarckian", "baldwinian")
+
+
+class ControllerRetuner:
+    # Budgeted inner loop that tunes the controllers of newly mutated bodies before they compete, the inherited
+    # controllers usually underrate a new body. Every new body gets budget short evaluations, in rounds of
+    # batch_size samples of a small CMA-ES around its inherited controllers, all bodies in the same pool call.
+    # Lamarckian retuning writes the best controllers into the genome, baldwinian retuning only evaluates them
+    # for the fitness of the individual (see EA.evaluate)
+    def __init__(self, budget: int = 16, batch_size: int = 8, eval_steps: int = config.EVALUATION_STEPS // 4,
+                 mode: str = "lamarckian", sigma: float = 0.1):
+        if mode not in RETUNE_MODES:
+            raise ValueError(f"Unknown retuning mode {mode}, use one of {RETUNE_MODES}")
+        self.budget = budget
+        self.batch_size = min(batch_size, budget)
+        self.eval_steps = eval_steps
+        self.mode = mode
+        self.sigma = sigma
+        self.evaluations = 0  # Spent since the last take_stats
+        self.steps = 0
+        self.gain = 0.0
+        self.retuned = 0
+
+    def spec_dict(self) -> dict:
+        return {"retune mode": self.mode, "retune budget": self.budget, "retune batch size": self.batch_size,
+                "retune steps": self.eval_steps, "retune sigma": self.sigma}
+
+    def retune(self, ea, inds: list[Individual]):
+        if len(inds) == 0:
+            return
+        run_config = ea.run_config
+        build_path = run_config.build_path if run_config.terrains is None else run_config.build_paths[0]
+        spaces = [ControllerSpace(ind) for ind in inds]
+        starts = [space.to_vector(ind) for space, ind in zip(spaces, inds)]
+        optimizers = [CMAES(start, self.sigma, seed=derive_seed(run_config.random_seed, ea.generation, i))
+                      for i, start in enumerate(starts)]
+        best = [(-np.inf, None) for _ in inds]
+        baseline = [None] * len(inds)
+
+        for start in range(0, self.budget, self.batch_size):
+            n = min(self.batch_size, self.budget - start)
+            samples = [optimizer.ask(n) for optimizer in optimizers]
+            if start == 0:  # The inherited controllers are the first sample, to measure the gain
+                for i, x in enumerate(starts):
+                    samples[i][0] = x
+            copies = [space.to_individual(x) for space, xs in zip(spaces, samples) for x in xs]
+            fitnesses = ea.pool.evaluate(copies, ea.toolbox.evaluate, build_path=build_path, seed=run_config.seed,
+                                         eval_steps=self.eval_steps)
+            self.evaluations += len(copies)
+            self.steps += sum(c.steps_used if c.steps_used is not None else self.eval_steps for c in copies)
+            if any(fitness is None for fitness in fitnesses):  # Interrupted, the individuals are left as they are
+                return
+            for i, optimizer in enumerate(optimizers):
+                batch = fitnesses[i * n:(i + 1) * n]
+                optimizer.tell(samples[i], batch)
+                if start == 0:
+                    baseline[i] = batch[0]
+                j = int(np.argmax(batch))
+                if batch[j] > best[i][0]:
+                    best[i] = (batch[j], samples[i][j])
+
+        for ind, space, baseline_fitness, (best_fitness, x) in zip(inds, spaces, baseline, best):
+            self.gain += best_fitness - baseline_fitness
+            self.retuned += 1
+            if best_fitness <= baseline_fitness:  # Nothing better than the inherited controllers
+                continue
+            if self.mode == "lamarckian":
+                space.set_vector(ind, x)
+            else:
+                ind.retuned = space.to_individual(x)
+
+    def take_stats(self) -> dict:
+        # Budget spent and fitness gained (in the short evaluations) since the last call, for the logbook
+        stats = {"retuned": self.retuned, "retune_evaluations": self.evaluations, "retune_steps": self.steps,
+                 "retune_gain": self.gain}
+        self.evaluations, self.steps, self.gain, self.retuned = 0, 0, 0.0, 0
+        return stats
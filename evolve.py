@@ -1,7 +1,6 @@
 import pickle
 import os
 import json
-from datetime import date
 import numpy as np
 
 from evolutionary_algorithms.only_controller import EA
@@ -13,43 +12,35 @@ from evolutionary_algorithms.bins_afp import BinsAgeFitnessPareto
 from evolutionary_algorithms.increasing_tournament import IncreasingTournament
 from evaluation.evaluator import Evaluator
 from controllers.coupled_oscillator import CoupledOscillator
+from robot.genome_codec import save_genomes
+from run_config import RunConfig
+from storage.results_store import ResultsStore, write_generation_arrays
+from metrics import MetricsExporter
 import config
 
-def get_run_nr():
-    with open(f"{config.RESULTS_PATH}/runs.csv", "r") as file:
-        lines = file.readlines()
-        if len(lines) == 0:
-            last_run_nr = 0
-        else:
-            last_run_nr = int(lines[-1].split(",")[0])
-    run_nr = last_run_nr + 1
-    return run_nr
+def get_run_nr():  # Only peeks at the next number, use get_run_folder to claim it
+    return ResultsStore().next_run_nr()
 
 
 def get_run_folder(run_nr: int = None) -> str:
-    if run_nr is None:
-        run_nr = get_run_nr()
-    # Add current run to runs.csv
-    with open(f"{config.RESULTS_PATH}/runs.csv", "a") as file:
-        file.write(f"{run_nr}, {date.today().strftime('%d/%m/%y')}\n")
-    # Create run folder if it doesn't exist
-    folder_name = f"{config.RESULTS_PATH}/run{run_nr}"
-    os.makedirs(os.path.dirname(f"{folder_name}/"), exist_ok=True)
-    return folder_name
+    return ResultsStore().register_run(run_nr)[1]
 
 
 def save_results(ea, folder: str):
     os.makedirs(os.path.dirname(f"{folder}/"), exist_ok=True)
     with open(f"{folder}/logbook.pickle", "wb") as file:
         pickle.dump(ea.logbook, file)
-    with open(f"{folder}/hall_of_fame.pickle", "wb") as file:
-        pickle.dump(ea.hall_of_fame, file)
     with open(f"{folder}/fitnesses_of_each_gen.pickle", "wb") as file:
         pickle.dump(ea.fitnesses_of_each_gen, file)
-    with open(f"{folder}/best_of_each_gen.pickle", "wb") as file:
-        pickle.dump(ea.best_of_each_gen, file)
-    with open(f"{folder}/last_generation.pickle", "wb") as file:
-        pickle.dump(ea.population, file)
+    save_genomes(f"{folder}/hall_of_fame.genomes", list(ea.hall_of_fame))
+    save_genomes(f"{folder}/best_of_each_gen.genomes", ea.best_of_each_gen)
+    if getattr(ea, "elite_archive", None) is not None:
+        save_genomes(f"{folder}/elites.genomes", ea.elite_archive.elites())
+    save_genomes(f"{folder}/last_generation.genomes", ea.population)
+    # The record history of the last best individual, oldest first
+    if len(ea.best_of_each_gen) > 0:
+        best = ea.best_of_each_gen[-1]
+        save_genomes(f"{folder}/lineage.genomes", [clone for _, clone in best.record] + [best])
     with open(f"{folder}/top20_fitness_age.pickle", "wb") as file:
         pickle.dump(ea.fitness_and_ages_of_top20_per_gen, file)
 
@@ -58,42 +49,45 @@ def save_results(ea, folder: str):
     np.save(f"{folder}/diversity_features.npy", diversity_features)
     joint_tables = np.asarray(ea.joint_tables, dtype=object)
     np.save(f"{folder}/joint_tables.npy", joint_tables)
+    write_generation_arrays(ea, folder)
+    if getattr(ea, "archive", None) is not None:  # MAP-Elites
+        ea.archive.save(f"{folder}/archive")
    
 
-def evolve(ea: EA, pop_size: int, generations: int, elitism: int, save: bool = True, env: str = None):
-    if env is not None:
-        if os.path.exists(f"{config.UNITY_BUILD_BASE_PATH}/{env}.app"):
-            config.UNITY_BUILD_PATH = f"{config.UNITY_BUILD_BASE_PATH}/{env}"
-        elif os.path.exists(f"{config.UNITY_BUILD_BASE_PATH}/{env}/{env}.x86_64"):
-            config.UNITY_BUILD_PATH = f"{config.UNITY_BUILD_BASE_PATH}/{env}/{env}"
+def evolve(ea: EA, pop_size: int, generations: int, elitism: int, save: bool = True, env: str | list[str] = None):
+    if env is not None:  # A list of terrains evaluates every robot on all of them
+        ea.run_config = RunConfig(terrains=env) if isinstance(env, list) else RunConfig(terrain=env)
 
     ea.run(pop_size, generations, elitism)
 
     if save:
-        folder = get_run_folder()
+        store = ResultsStore()
+        run_nr, folder = store.register_run()
         with open(f"{folder}/specs.json", "w") as file:
             json.dump(ea.spec_dict(), file)
         save_results(ea, folder)
+        store.add_replicate(run_nr, folder, ea.spec_dict(), terrain=ea.run_config.terrain)
         
 
-def evolve_n_times(ea: EA, pop_size: int, generations: int, n: int, elitism: int = 0, env: str = None):
-    if env is not None:
-        if os.path.exists(f"{config.UNITY_BUILD_BASE_PATH}/{env}.app"):
-            config.UNITY_BUILD_PATH = f"{config.UNITY_BUILD_BASE_PATH}/{env}"
-        elif os.path.exists(f"{config.UNITY_BUILD_BASE_PATH}/{env}/{env}.x86_64"):
-            config.UNITY_BUILD_PATH = f"{config.UNITY_BUILD_BASE_PATH}/{env}/{env}"
+def evolve_n_times(ea: EA, pop_size: int, generations: int, n: int, elitism: int = 0, env: str | list[str] = None):
+    if env is not None:  # A list of terrains evaluates every robot on all of them
+        ea.run_config = RunConfig(terrains=env) if isinstance(env, list) else RunConfig(terrain=env)
 
+    store = ResultsStore()
     folder = ""
+    run_nr = None
     for i in range(n):
+        ea.run_config.replicate = i  # Otherwise every replicate evolves the same robots
         if i == n-1:
             ea.run(pop_size, generations, elitism, close_envs=True)
         else:
             ea.run(pop_size, generations, elitism, close_envs=False)
         if i == 0: # Only want to save stats if at least one run is successfull
-            folder = get_run_folder()
+            run_nr, folder = store.register_run()
             with open(f"{folder}/specs.json", "w") as file:
                 json.dump(ea.spec_dict(), file)
         save_results(ea, f"{folder}/{i}")
+        store.add_replicate(run_nr, f"{folder}/{i}", ea.spec_dict(), replicate=i, terrain=ea.run_config.terrain)
 
 
 if __name__ == "__main__":
@@ -107,4 +101,9 @@ if __name__ == "__main__":
         no_graphics=True,
         protection=True
     )
+    if config.AUTOTUNE_PROCESSES:
+        ea.pool.autotune()
+    if config.METRICS_PORT is not None:
+        ea.add_writer(MetricsExporter(ea.pool, port=config.METRICS_PORT, jsonl_path=f"{config.LOG_PATH}/metrics.jsonl",
+                                      host=config.METRICS_HOST))
     evolve_n_times(ea, pop_size=100, generations=500, n=10, elitism=1, env="flat")
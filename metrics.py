@@ -0,0 +1,169 @@
+import re
+import time
+from threading import Thread
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from evolutionary_algorithms.generation_summary import JsonlStreamWriter
+
+PREFIX = "modular_robots_"
+DURATION_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)  # Seconds per evaluation
+
+
+def metric_name(name: str) -> str:
+    return PREFIX + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+class Counter:
+    TYPE = "counter"
+
+    def __init__(self, name: str, description: str):
+        self.name = metric_name(name)
+        self.description = description
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def samples(self) -> list[tuple[str, float]]:
+        return [(self.name, self.value)]
+
+
+class Gauge(Counter):
+    TYPE = "gauge"
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Histogram:
+    TYPE = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: tuple = DURATION_BUCKETS):
+        self.name = metric_name(name)
+        self.description = description
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self) -> list[tuple[str, float]]:
+        samples = []
+        cumulative = 0
+        for bound, count in zip(list(self.buckets) + ["+Inf"], self.counts):
+            cumulative += count
+            samples.append((f'{self.name}_bucket{{le="{bound}"}}', cumulative))
+        samples.append((f"{self.name}_sum", self.sum))
+        samples.append((f"{self.name}_count", self.count))
+        return samples
+
+
+class MetricsExporter:
+    # Added to an EA with ea.add_writer, aggregates the evaluator counters once per generation.
+    # The HTTP endpoint serves the text rendered at the last generation, so scrapes do no work in the step loop.
+    # It only listens on localhost unless another host is given, e.g. "0.0.0.0" for a prometheus on another machine
+    def __init__(self, pool, port: int = None, jsonl_path: str = None, host: str = "127.0.0.1"):
+        self.pool = pool
+        self.metrics = {}
+        self.generation = self.gauge("generation", "Last recorded generation")
+        self.evaluations = self.counter("evaluations_total", "Evaluations by all evaluators")
+        self.steps = self.counter("simulation_steps_total", "Simulated steps by all evaluators")
+        self.early_terminations = self.counter("early_terminations_total", "Evaluations stopped before eval_steps")
+        self.env_launches = self.counter("unity_launches_total", "Unity environments launched, including restarts")
+        self.evals_per_second = self.gauge("evaluations_per_second", "Evaluations per second in the last generation")
+        self.utilisation = self.gauge("evaluator_utilisation", "Share of the last generation evaluators were busy")
+        self.early_termination_rate = self.gauge("early_termination_rate",
+                                                 "Share of the last generation's evaluations stopped early")
+        self.durations = self.histogram("evaluation_seconds", "Seconds per evaluation")
+        self.text = ""
+        self.last_time = time.time()
+        self.last_totals = self.totals()
+
+        self.jsonl = JsonlStreamWriter(jsonl_path) if jsonl_path is not None else None
+        self.server = None
+        if port is not None:
+            self.server = ThreadingHTTPServer((host, port), self.request_handler())
+            self.port = self.server.server_address[1]
+            Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def counter(self, name: str, description: str) -> Counter:
+        return self.metrics.setdefault(name, Counter(name, description))
+
+    def gauge(self, name: str, description: str) -> Gauge:
+        return self.metrics.setdefault(name, Gauge(name, description))
+
+    def histogram(self, name: str, description: str, buckets: tuple = DURATION_BUCKETS) -> Histogram:
+        return self.metrics.setdefault(name, Histogram(name, description, buckets))
+
+    def totals(self) -> tuple:
+        stats = [evaluator.stats for evaluator in self.pool.evaluators]
+        return (sum(s.evaluations for s in stats), sum(s.steps for s in stats),
+                sum(s.early_terminations for s in stats), sum(s.env_launches for s in stats),
+                sum(s.busy_time for s in stats))
+
+    def write(self, record: dict):
+        # Called with the logbook record of every generation
+        now = time.time()
+        totals = self.totals()
+        evaluations, steps, early_terminations, env_launches, busy_time = (
+            total - last for total, last in zip(totals, self.last_totals))
+        elapsed = max(now - self.last_time, 1e-9)
+        self.last_time, self.last_totals = now, totals
+
+        self.evaluations.inc(evaluations)
+        self.steps.inc(steps)
+        self.early_terminations.inc(early_terminations)
+        self.env_launches.inc(env_launches)
+        self.evals_per_second.set(evaluations / elapsed)
+        self.utilisation.set(busy_time / (elapsed * max(len(self.pool.evaluators), 1)))
+        self.early_termination_rate.set(early_terminations / evaluations if evaluations > 0 else 0.0)
+        for evaluator in self.pool.evaluators:
+            for duration in evaluator.stats.take_durations():
+                self.durations.observe(duration)
+        for key, value in record.items():
+            if key != "gen" and isinstance(value, (int, float)):
+                self.gauge(key, f"Logbook column {key}").set(value)
+        self.generation.set(record.get("gen", 0))
+
+        self.text = self.render()
+        if self.jsonl is not None:
+            self.jsonl.write({"time": now, **{name: value for metric in self.metrics.values()
+                                              for name, value in metric.samples()}})
+
+    def render(self) -> str:
+        # Prometheus text exposition format
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.TYPE}")
+            lines += [f"{name} {value}" for name, value in metric.samples()]
+        return "\n".join(lines) + "\n"
+
+    def request_handler(self) -> type[BaseHTTPRequestHandler]:
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = exporter.text.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):  # Scrapes should not clutter the logbook stream
+                pass
+
+        return Handler
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
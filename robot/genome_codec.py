@@ -0,0 +1,158 @@
+import os
+import struct
+import pickle
+import hashlib
+import numpy as np
+
+import config
+from controllers.controller import Controller
+from controllers.coupled_oscillator import CoupledOscillator
+from robot.individual import Individual
+
+# Binary format: header (magic, version, controller class, count) followed by fixed size records
+MAGIC = b"MRGC"
+CODEC_VERSION = 1
+HEADER = struct.Struct("<4sH32sI")
+MAX_MODULES = config.MAX_MODULES_UNITY
+MAX_PARAMETERS = 3
+MODULE_TYPES = ["Root", "BodyJoint1", "BodyJoint2", "BodyJoint3", "BodyJoint4",
+                "LimbJoint1", "LimbJoint2", "LimbJoint3", "LimbJoint4"]
+MODULE_TYPE_INDEX = {name: i for i, name in enumerate(MODULE_TYPES)}
+CONTROLLERS = {"CoupledOscillator": CoupledOscillator}
+
+GENOME_DTYPES = {
+    1: np.dtype([("fitness", "<f8"),
+                 ("morph_age", "<i4"),
+                 ("prev_age", "<i4"),
+                 ("lineage_id", "<u8"),
+                 ("n_modules", "<u1"),
+                 ("parent", "<i1", MAX_MODULES),
+                 ("connection_site", "<u1", MAX_MODULES),
+                 ("angle", "<i2", MAX_MODULES),
+                 ("type", "<u1", MAX_MODULES),
+                 ("complementary", "<i1", MAX_MODULES),
+                 ("parameters", "<f8", (MAX_MODULES, MAX_PARAMETERS))])
+}
+GENOME_DTYPE = GENOME_DTYPES[CODEC_VERSION]
+# Fields that describe the robot itself, used for cache keys and duplicate detection
+STRUCTURE_FIELDS = ["n_modules", "parent", "connection_site", "angle", "type", "complementary", "parameters"]
+
+
+def to_records(individuals: list[Individual]) -> np.ndarray:
+    records = np.zeros(len(individuals), dtype=GENOME_DTYPE)
+    genomes = [ind.get_genome() for ind in individuals]
+    records["fitness"] = [g[0] for g in genomes]
+    records["morph_age"] = [g[1] for g in genomes]
+    records["prev_age"] = [g[2] for g in genomes]
+    records["lineage_id"] = [g[3] for g in genomes]
+    records["n_modules"] = [len(g[4]) for g in genomes]
+    parents, sites, angles = records["parent"], records["connection_site"], records["angle"]
+    types, complementaries, parameters = records["type"], records["complementary"], records["parameters"]
+    for g, (_, _, _, _, modules) in enumerate(genomes):
+        n = len(modules)
+        columns = list(zip(*modules))
+        parents[g, :n] = columns[0]
+        sites[g, :n] = columns[1]
+        angles[g, :n] = columns[2]
+        types[g, :n] = [MODULE_TYPE_INDEX[t] for t in columns[3]]
+        complementaries[g, :n] = columns[4]
+        parameters[g, :n, :len(columns) - 5] = np.array(columns[5:]).T
+    return records
+
+
+def from_records(records: np.ndarray, controller_class: type[Controller]) -> list[Individual]:
+    n_parameters = len(controller_class.PARAMETERS)
+    # Converting whole columns at once is much faster than reading the numpy fields one by one
+    fitnesses = records["fitness"].tolist()
+    morph_ages = records["morph_age"].tolist()
+    prev_ages = records["prev_age"].tolist()
+    lineage_ids = records["lineage_id"].tolist()
+    n_modules = records["n_modules"].tolist()
+    parents = records["parent"].tolist()
+    sites = records["connection_site"].tolist()
+    angles = records["angle"].tolist()
+    types = records["type"].tolist()
+    complementaries = records["complementary"].tolist()
+    parameters = records["parameters"][:, :, :n_parameters].tolist()
+
+    individuals = []
+    for g in range(len(records)):
+        modules = tuple((parents[g][i], sites[g][i], angles[g][i], MODULE_TYPES[types[g][i]],
+                         complementaries[g][i], *parameters[g][i]) for i in range(n_modules[g]))
+        genome = (fitnesses[g], morph_ages[g], prev_ages[g], lineage_ids[g], modules)
+        individuals.append(Individual(controller_class, genome=genome))
+    return individuals
+
+
+def encode_batch(individuals: list[Individual]) -> bytes:
+    controller_name = individuals[0].controller_class.__name__ if len(individuals) > 0 else ""
+    header = HEADER.pack(MAGIC, CODEC_VERSION, controller_name.encode(), len(individuals))
+    return header + to_records(individuals).tobytes()
+
+
+def decode_batch(data: bytes) -> list[Individual]:
+    magic, version, controller_name, count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not an encoded genome")
+    if version not in GENOME_DTYPES:
+        raise ValueError(f"Unknown genome codec version {version}, the newest known is {CODEC_VERSION}")
+    if count == 0:
+        return []
+    records = np.frombuffer(data, dtype=GENOME_DTYPES[version], count=count, offset=HEADER.size)
+    return from_records(records, CONTROLLERS[controller_name.rstrip(b"\0").decode()])
+
+
+def encode(ind: Individual) -> bytes:
+    return encode_batch([ind])
+
+
+def decode(data: bytes) -> Individual:
+    return decode_batch(data)[0]
+
+
+def genome_key(ind: Individual, *context) -> str:
+    # Same for two robots with the same body and controller, context is e.g. the terrain and seed
+    return record_key(to_records([ind])[0], *context)
+
+
+def record_key(record: np.void, *context) -> str:
+    # genome_key of an encoded record, for batches that are already converted
+    digest = hashlib.sha1()
+    for field in STRUCTURE_FIELDS:
+        digest.update(np.ascontiguousarray(record[field]).tobytes())
+    digest.update(repr(context).encode())
+    return digest.hexdigest()
+
+
+def save_genomes(path: str, individuals: list[Individual]):
+    with open(path, "wb") as file:
+        file.write(encode_batch(individuals))
+
+
+def load_genomes(path: str) -> list[Individual]:
+    with open(path, "rb") as file:
+        return decode_batch(file.read())
+
+
+def load_pickled_individuals(pickle_path: str) -> list[Individual]:
+    with open(pickle_path, "rb") as file:
+        individuals = list(pickle.load(file))
+    for ind in individuals:
+        if not hasattr(ind, "lineage_id"):  # Pickled before individuals had a lineage id
+            ind.lineage_id = 0
+    return individuals
+
+
+def load_individuals(folder: str, name: str) -> list[Individual]:
+    # Prefers the encoded genomes, results saved before the codec only have pickles
+    if os.path.exists(f"{folder}/{name}.genomes"):
+        return load_genomes(f"{folder}/{name}.genomes")
+    return load_pickled_individuals(f"{folder}/{name}.pickle")
+
+
+def convert_pickle(pickle_path: str, genomes_path: str = None):
+    # One-way conversion of hall_of_fame, best_of_each_gen or last_generation pickles
+    individuals = load_pickled_individuals(pickle_path)
+    if genomes_path is None:
+        genomes_path = pickle_path.replace(".pickle", ".genomes")
+    save_genomes(genomes_path, individuals)
@@ -8,24 +8,38 @@ import config
 from controllers.controller import Controller
 from controllers.coupled_oscillator import CoupledOscillator
 from robot.module import Module, Root, BodyJoint, LimbJoint
+from robot.occupancy import collides
 
 
 class Individual:
     def __init__(self, controller_class: type[Controller], json_path: str = None,
-                 fitness=-1.0, create_simple: bool = True):
+                 fitness=-1.0, create_simple: bool = True, genome: tuple = None, names: tuple = None):
         self.fitness = fitness
         self.record = []
         self.controller_class = controller_class
         self.prev_age = 1   # Used if the age is reset because of a mutation that doesn't render
         self.added = 0  # Added since last evaluation
         self.morph_age = 0
+        self.lineage_id = random.getrandbits(64)  # Inherited by every clone and mutated offspring
+        self.steps_used = None  # Steps and termination reason ("completed", "fell", ...) of the last evaluation
+        self.termination = None
+        self.behaviour = None  # Fitness trace of the last evaluation, see Evaluator.evaluate
+        self.novelty = 0.0  # Set by NoveltySearch, selection uses it instead of the fitness in novelty search
+        self.retuned = None  # Copy with retuned controllers that is evaluated instead, see ControllerRetuner
+        self.evaluation_sample = 0  # Number of a repeated evaluation of the same robot, see RacingReevaluator
+        self.fitness_samples = 0  # Running mean and variance of the evaluations, see RacingReevaluator
+        self.fitness_mean = 0.0
+        self.fitness_m2 = 0.0
         self.mutations = []
+        self.collision_hits = 0  # Placements the collision model repaired or rejected, counted by the EA
         # Diversity features:
         self.body_joints = 0
         self.limb_joints = 0
         self.limbs = 0
 
-        if json_path is not None:
+        if genome is not None:
+            self.load_genome(genome, names)
+        elif json_path is not None:
             self.load_from_json(json_path)  # Handle without complementary here as well
         else:  # Temporary
             self.root = Root(self.controller_class)
@@ -42,7 +56,9 @@ class Individual:
 
         if not simple:
             number_of_modules = random.randint(4, config.MAX_MODULES_PYTHON)
-            while len(self.modules) < number_of_modules:
+            for _ in range(config.CREATE_ADD_ATTEMPTS):
+                if len(self.modules) >= number_of_modules:
+                    break
                 self.add_module(init=True)
 
         self.generate_module_lists()
@@ -81,6 +97,72 @@ class Individual:
         self.modules_without_complementaries = []
         self.generate_module_lists()
 
+    def get_genome(self) -> tuple:
+        # Compact representation without names, parent pointers and record history, e.g. for migration
+        index = {module: i for i, module in enumerate(self.modules)}
+        modules = []
+        for module in self.modules:
+            parent = index[module.parent] if module.parent is not None else -1
+            complementary = index.get(getattr(module, "complementary_limb", None), -1)
+            modules.append((parent, module.connection_site, module.angle, module.joint_type, complementary,
+                            *module.controller.get_parameters()))
+        return self.fitness, self.morph_age, self.prev_age, self.lineage_id, tuple(modules)
+
+    def load_genome(self, genome: tuple, names: tuple = None):
+        # Nodes without controller parameters keep the parameters drawn when the modules are created.
+        # names only have to be unique within the robot, new ones are generated if not given
+        self.fitness, self.morph_age, self.prev_age, self.lineage_id, nodes = genome
+        modules = []
+        for i, (parent_index, con_site, angle, module_type, _, *parameters) in enumerate(nodes):
+            name = names[i] if names is not None else str(uuid.uuid4())
+            if parent_index == -1:
+                self.root = Root(self.controller_class)
+                module = self.root
+            elif module_type in config.BODY_JOINTS:
+                parent = modules[parent_index]
+                module = BodyJoint(name, parent, con_site, angle, self.controller_class, module_type)
+                parent.children.append(module)
+                parent.number_of_body_children += 1
+            else:
+                parent = modules[parent_index]
+                module = LimbJoint(name, parent, con_site, angle, self.controller_class, module_type)
+                parent.children.append(module)
+                parent.number_of_limb_children += 1
+            if parameters:
+                module.controller.set_parameters(parameters)
+            modules.append(module)
+
+        for module, node in zip(modules, nodes):
+            if node[4] != -1:
+                module.complementary_limb = modules[node[4]]
+
+        self.modules = []
+        self.modules_without_complementaries = []
+        self.generate_module_lists()
+
+    def copy_genome(self):
+        # Same robot and controllers without the mutation record, much cheaper than deepcopy
+        copy = Individual(self.controller_class, genome=self.get_genome(), names=[m.name for m in self.modules])
+        copy.evaluation_sample = getattr(self, "evaluation_sample", 0)
+        return copy
+
+    def reset_fitness_samples(self, fitness: float):
+        self.fitness_samples = 1
+        self.fitness_mean = fitness
+        self.fitness_m2 = 0.0
+
+    def add_fitness_sample(self, fitness: float):
+        # Welford's update, the fitness becomes the mean of the samples
+        self.fitness_samples += 1
+        delta = fitness - self.fitness_mean
+        self.fitness_mean += delta / self.fitness_samples
+        self.fitness_m2 += delta * (fitness - self.fitness_mean)
+        self.fitness = float(np.round(self.fitness_mean, 3))
+
+    @property
+    def fitness_variance(self) -> float:
+        return self.fitness_m2 / (self.fitness_samples - 1) if self.fitness_samples > 1 else 0.0
+
     def get_json_string(self) -> str:
         nodes = [module.get_dict_for_json() for module in self.modules]
         return json.dumps({"nodes": nodes})
@@ -90,6 +172,17 @@ class Individual:
             module.controller.mutate(mutation_rate, mutation_sigma)
         self.morph_age += 1
 
+    @staticmethod
+    def mutate_controllers(individuals: list, mutation_rate: float, mutation_sigma: float):
+        # Same as mutate_controller for every individual, each controller class mutates all its controllers at once
+        controllers = {}
+        for ind in individuals:
+            for module in ind.modules:
+                controllers.setdefault(type(module.controller), []).append(module.controller)
+            ind.morph_age += 1
+        for controller_class, same_class in controllers.items():
+            controller_class.mutate_batch(same_class, mutation_rate, mutation_sigma)
+
     def mutate_body(self, mutation_rate: float, mutations: list = None):
         if mutations == None:
             mutations = ["remove", "add", "swap"]
@@ -135,15 +228,24 @@ class Individual:
                 number_of_body_connectors += 1
 
         chance_of_body = number_of_body_connectors / (number_of_body_connectors + number_of_limb_connectors)
+        modules_before = set(self.modules)
         if random.uniform(0, 1) < chance_of_body:
             module = random.choice(modules_can_add_body)
             module.add_body(init)
         else:
             module = random.choice(modules_can_add_limb)
             module.add_limb(init)
-        
-        self.added += 1
+
         self.generate_module_lists()
+        new_modules = [m for m in self.modules if m not in modules_before]
+        if not self.check_placement(new_modules):
+            for new_module in new_modules:
+                if new_module in new_module.parent.children:  # The complementary limb is removed with its pair
+                    self._remove_module(new_module)
+            self.generate_module_lists()
+            return False
+
+        self.added += 1
         if random.uniform(0, 1) < config.REPEAT_ADD_PROB:
             self.add_module(depth + 1, init)
         return True
@@ -177,8 +279,45 @@ class Individual:
         if len(modules) == 0:  # Should not be possible
             return False
 
-        random.choice(modules).swap()
-        return True
+        module = random.choice(modules)
+        state = self.get_placement_state(module)
+        moved = [m for m, *_ in state]
+        for attempt in range(config.SWAP_ATTEMPTS):
+            module.swap()
+            if not config.COLLISION_PRECHECK or not collides(self.root, moved):
+                self.collision_hits += attempt > 0
+                return True
+            self.set_placement_state(module, state)
+        self.collision_hits += 1
+        return False
+
+    @staticmethod
+    def get_placement_state(module: Module) -> list[tuple]:
+        modules = [module] + ([module.complementary_limb] if isinstance(module, LimbJoint) else [])
+        return [(m, m.joint_type, m.connection_site, m.angle) for m in modules]
+
+    @staticmethod
+    def set_placement_state(module: Module, state: list[tuple]):
+        for m, joint_type, con_site, angle in state:
+            m.joint_type, m.connection_site, m.angle = joint_type, con_site, angle
+
+    def check_placement(self, new_modules: list[Module]) -> bool:
+        # Moves new limbs to a free placement if they would overlap other modules,
+        # so unity does not have to skip them and the genome does not have to be cleaned up
+        if not config.COLLISION_PRECHECK or not collides(self.root, new_modules):
+            return True
+        limbs = [m for m in new_modules if isinstance(m, LimbJoint) and m.complementary_limb in new_modules]
+        if len(limbs) > 0:
+            limb = limbs[0]
+            placements = limb.get_placements()
+            random.shuffle(placements)
+            for con_site, angle in placements:
+                limb.place(con_site, angle)
+                if not collides(self.root, new_modules):
+                    self.collision_hits += 1
+                    return True
+        self.collision_hits += 1
+        return False
 
     def generate_module_lists(self):  # Generates module list based on BFS
         self.modules[:] = [self.root]
@@ -166,16 +166,28 @@ class LimbJoint(Module):
         other_joint_types.remove(self.joint_type)
         self.joint_type = random.choice(other_joint_types)
         self.complementary_limb.joint_type = self.joint_type
-        self.angle = random.choice(config.ROTATIONS)
+        angle = random.choice(config.ROTATIONS)
         if type(self.parent) == LimbJoint:
-            self.connection_site = random.choice((0, 1, 2))
-            self.complementary_limb.connection_site = self.connection_site
-            if self.connection_site == 2:
-                self.complementary_limb.angle = -self.angle
+            self.place(random.choice((0, 1, 2)), angle)
+        else:
+            self.place(self.connection_site, angle)
+
+    def place(self, con_site: int, angle: int):  # Moves the pair of limbs, keeping them mirrored
+        self.angle = angle
+        self.connection_site = con_site
+        if type(self.parent) == LimbJoint:
+            self.complementary_limb.connection_site = con_site
+            if con_site == 2:
+                self.complementary_limb.angle = -angle
             else:
-                self.complementary_limb.angle = -self.angle + 180
+                self.complementary_limb.angle = -angle + 180
         else:
-            self.complementary_limb.angle = -self.angle
+            self.complementary_limb.angle = -angle
+
+    def get_placements(self) -> list[tuple[int, int]]:
+        # Every (connection site, angle) this pair of limbs could have
+        con_sites = (0, 1, 2) if type(self.parent) == LimbJoint else (self.connection_site,)
+        return [(con_site, angle) for con_site in con_sites for angle in config.ROTATIONS]
 
     def DFS_count(self, n: int):
         n += 1
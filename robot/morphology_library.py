@@ -0,0 +1,61 @@
+import json
+import random
+
+import config
+from controllers.controller import Controller
+from robot.individual import Individual
+
+
+def parse_morphology(json_path: str) -> tuple[tuple, tuple]:
+    # Same morphology as Individual.load_from_json, as genome nodes without controller parameters and module names
+    with open(json_path) as f:
+        json_dict = json.load(f)
+
+    index = {}
+    nodes = []
+    names = []
+    for node in json_dict["nodes"]:
+        module_type = node["type"]
+        if module_type == "Root":
+            index["root"] = len(nodes)
+            nodes.append((-1, 0, 0, module_type, -1))
+            names.append("root")
+        elif module_type in config.BODY_JOINTS or module_type in config.LIMB_JOINTS:
+            index[node["name"]] = len(nodes)
+            nodes.append((index[node["parent"]], int(node["connection_site"]), node["angle"], module_type, -1))
+            names.append(node["name"])
+    return tuple(nodes), tuple(names)
+
+
+class MorphologyLibrary:
+    # Parsed morphologies, individuals with a fixed body are stamped out without reading the json again.
+    # Only the controller parameters are drawn per individual, the same way as when loading the json
+    def __init__(self):
+        self.templates = []
+        self.index = {}  # json path -> template index
+
+    def load(self, json_path: str) -> int:
+        if json_path not in self.index:
+            self.index[json_path] = len(self.templates)
+            self.templates.append(parse_morphology(json_path))
+        return self.index[json_path]
+
+    def preload(self, json_paths: list[str]) -> list[int]:
+        return [self.load(json_path) for json_path in json_paths]
+
+    def __len__(self) -> int:
+        return len(self.templates)
+
+    def create(self, controller_class: type[Controller], json_path: str = None, template: int = None) -> Individual:
+        # From the template of json_path (parsed on first use) or the template with the given index
+        if template is None:
+            template = self.load(json_path)
+        nodes, names = self.templates[template]
+        return Individual(controller_class, genome=(-1.0, 0, 1, random.getrandbits(64), nodes), names=names)
+
+    def sample(self, controller_class: type[Controller]) -> Individual:
+        # Individual with a random preloaded morphology, for mixed populations
+        return self.create(controller_class, template=random.randrange(len(self.templates)))
+
+
+morphology_library = MorphologyLibrary()  # Shared by every EA in the process
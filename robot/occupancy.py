@@ -0,0 +1,127 @@
+import numpy as np
+
+# Model of how unity places the modules of a robot (ModularRobot.MakeRobot), with the colliders of the prefabs in
+# Modbots.unitypackage. Unity places the modules breadth first, every module at the connection site of its parent,
+# rotated by its angle around its own up (y) axis. A module is skipped with its subtree if its CollisionChecker box
+# overlaps a collider of a module placed before it, or if the box is more than SPAWN_HEIGHT - 0.6 below the root.
+# The joint types of a body or limb only differ in the axis of their joint, their connection sites and colliders
+# are the same (BodyJoint4 has a higher base box). BodyJoint3, LimbJoint1 and LimbJoint3 are not in the package,
+# they are assumed to be like the other body and limb joints.
+SPAWN_HEIGHT = 3.0
+MIN_CHECKER_HEIGHT = 0.6
+TOLERANCE = 1e-4  # Colliders of neighbouring modules are 0.005 apart, they do not touch
+
+
+def site(position: tuple, up: tuple, forward: tuple) -> tuple:
+    # Connection site as a position and a rotation matrix with the columns x, y (up) and z (forward)
+    up, forward = np.array(up, dtype=float), np.array(forward, dtype=float)
+    return np.array(position, dtype=float), np.column_stack((np.cross(up, forward), up, forward))
+
+
+def box(center: tuple, size: tuple) -> tuple:
+    return "box", np.array(center, dtype=float), np.array(size, dtype=float) / 2
+
+
+def capsule(center: tuple, radius: float, height: float, axis: tuple) -> tuple:
+    # The height includes the caps
+    half_segment = np.array(axis, dtype=float) * (height / 2 - radius)
+    return "capsule", np.array(center, dtype=float), radius, half_segment
+
+
+BODY_SITES = [site((0.25, 0.6, 0), (1, 0, 0), (0, 1, 0)), site((-0.25, 0.6, 0), (-1, 0, 0), (0, -1, 0)),
+              site((0, 0.85, 0), (0, 1, 0), (0, 0, 1))]
+LIMB_SITES = [site((0.1, 0.525, 0), (1, 0, 0), (0, 1, 0)), site((-0.1, 0.525, 0), (-1, 0, 0), (0, -1, 0)),
+              site((0, 0.45, 0), (0, 1, 0), (0, 0, 1))]
+ROOT_SITES = [site((0, 0, -0.25), (0, 0, -1), (1, 0, 0)), site((0, 0, 0.25), (0, 0, 1), (-1, 0, 0)),
+              site((0.25, 0, 0), (1, 0, 0), (0, -1, 0)), site((-0.25, 0, 0), (-1, 0, 0), (0, -1, 0))]
+
+# Per joint type: the distance of the module origin from its parent's connection site, its connection sites,
+# its CollisionChecker box and the colliders later modules are checked against, in the frame of the module
+BODY = {"offset": 0.15, "sites": BODY_SITES, "checker": box((0, 0.6, 0), (0.5, 0.99, 0.5)),
+        "colliders": [capsule((0, 0.7, 0), 0.25, 0.8, (0, 1, 0)), box((0, 0.1, 0), (0.5, 0.45, 0.5))]}
+LIMB = {"offset": 0.2, "sites": LIMB_SITES, "checker": box((0, 0.325, 0), (0.25, 0.64, 0.25)),
+        "colliders": [capsule((0, 0.375, 0), 0.125, 0.55, (0, 1, 0)), box((0, 0, 0), (0.25, 0.25, 0.25))]}
+MODULE_GEOMETRY = {"Root": {"offset": 0.0, "sites": ROOT_SITES, "checker": box((0, 0, 0), (1, 0.5, 0.5)),
+                            "colliders": [capsule((0, 0, 0), 0.25, 0.75, (1, 0, 0))]},
+                   "BodyJoint1": BODY, "BodyJoint2": BODY, "BodyJoint3": BODY,
+                   "BodyJoint4": dict(BODY, colliders=[BODY["colliders"][0], box((0, 0.1, 0), (0.5, 0.5, 0.5))]),
+                   "LimbJoint1": LIMB, "LimbJoint2": LIMB, "LimbJoint3": LIMB, "LimbJoint4": LIMB}
+
+
+def rotation_y(angle: int) -> np.ndarray:
+    # The angles (config.ROTATIONS) are multiples of 90 degrees, so all rotations only swap and flip axes
+    c, s = int(round(np.cos(np.radians(angle)))), int(round(np.sin(np.radians(angle))))
+    return np.array([[c, 0, s], [0, 1, 0], [-s, 0, c]])
+
+
+def transform(shape: tuple, position: np.ndarray, rotation: np.ndarray) -> tuple:
+    # Axis aligned shape in world coordinates: the center, half its extent along every axis and a radius,
+    # boxes have radius 0 and capsules are the box around their segment with the capsule's radius
+    if shape[0] == "box":
+        center, extent, radius = shape[1], np.abs(rotation) @ shape[2], 0.0
+    else:
+        center, extent, radius = shape[1], np.abs(rotation @ shape[3]), shape[2]
+    return tuple((position + rotation @ center).tolist()), tuple(extent.tolist()), radius
+
+
+def overlaps(checker: tuple, shape: tuple) -> bool:
+    # The distance between axis aligned boxes is the length of their gaps along the axes
+    (center_a, extent_a, _), (center_b, extent_b, radius) = checker, shape
+    if radius == 0.0:
+        return all(abs(a - b) < ea + eb - TOLERANCE
+                   for a, b, ea, eb in zip(center_a, center_b, extent_a, extent_b))
+    gaps = [max(0.0, abs(a - b) - ea - eb) for a, b, ea, eb in zip(center_a, center_b, extent_a, extent_b)]
+    return sum(gap * gap for gap in gaps) < (radius - TOLERANCE) ** 2
+
+
+def place_modules(root) -> tuple[list, dict]:
+    # Places the modules like unity does, returns the placed modules in order and the placed modules every
+    # skipped module collided with (empty if it was below the floor)
+    geometry = MODULE_GEOMETRY[root.joint_type]
+    position, rotation = np.array([0.0, SPAWN_HEIGHT, 0.0]), np.identity(3)
+    frames = {root: (position, rotation)}
+    placed = [root]
+    colliders = [(root, transform(shape, position, rotation))
+                 for shape in [geometry["checker"]] + geometry["colliders"]]
+    skipped = {}
+    queue = list(root.children)
+    while queue:
+        module = queue.pop(0)
+        geometry = MODULE_GEOMETRY[module.joint_type]
+        parent_position, parent_rotation = frames[module.parent]
+        site_position, site_rotation = MODULE_GEOMETRY[module.parent.joint_type]["sites"][module.connection_site]
+        site_rotation = parent_rotation @ site_rotation
+        position = parent_position + parent_rotation @ site_position + site_rotation[:, 1] * geometry["offset"]
+        rotation = site_rotation @ rotation_y(module.angle)
+
+        checker = transform(geometry["checker"], position, rotation)
+        if checker[0][1] < MIN_CHECKER_HEIGHT:
+            skipped[module] = []
+            continue
+        hits = [other for other, shape in colliders if overlaps(checker, shape)]
+        if len(hits) > 0:
+            skipped[module] = hits
+            continue
+        frames[module] = (position, rotation)
+        placed.append(module)
+        colliders += [(module, shape) for shape in [checker] + [transform(s, position, rotation)
+                                                                for s in geometry["colliders"]]]
+        queue += module.children
+    return placed, skipped
+
+
+def subtree(module) -> list:
+    modules = [module]
+    for child in module.children:
+        modules += subtree(child)
+    return modules
+
+
+def collides(root, moved: list) -> bool:
+    # True if unity would skip a module in the subtrees of moved, or skip a module because it hits one of them
+    moved_modules = set()
+    for module in moved:
+        moved_modules.update(subtree(module))
+    _, skipped = place_modules(root)
+    return any(module in moved_modules or any(hit in moved_modules for hit in hits)
+               for module, hits in skipped.items())
@@ -0,0 +1,64 @@
+import numpy as np
+
+import config
+from evaluation.evaluator import get_unity_build_path
+from seeding import derive_seed
+
+AGGREGATIONS = ("min", "mean", "weighted")
+SKIPPED_FITNESS = -np.inf  # Of robots ruled out by skip_below, below every robot evaluated on all terrains
+
+
+class RunConfig:
+    # Settings of one run, used instead of changing the globals in config so runs can share a process
+    def __init__(self, terrain: str = None, eval_steps: int = config.EVALUATION_STEPS, seed: int = config.SEED,
+                 terrains: list[str] = None, aggregation: str = "mean", weights: list[float] = None,
+                 skip_below: float = None, replicate: int = 0):
+        # With several terrains the fitness is aggregated over them, terrain is then only their joined names.
+        # If skip_below is set, the other terrains are only evaluated if the fitness on the first one is not below it.
+        # Replicates of the same settings share the simulator seed but draw their own robots, see random_seed
+        if aggregation not in AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation {aggregation}, use one of {AGGREGATIONS}")
+        self.terrains = list(terrains) if terrains is not None else None
+        self.terrain = "+".join(terrains) if terrains is not None else terrain
+        self.build_path = get_unity_build_path(terrain) if terrain is not None and terrains is None else None
+        self.build_paths = [get_unity_build_path(t) for t in terrains] if terrains is not None else None
+        self.eval_steps = eval_steps
+        self.seed = seed
+        self.replicate = replicate
+        self.aggregation = aggregation
+        if weights is not None and len(weights) != len(terrains or []):
+            raise ValueError(f"{len(weights)} weights for {len(terrains or [])} terrains")
+        self.weights = weights if weights is not None else [1.0] * len(terrains or [])
+        self.skip_below = skip_below
+
+    @property
+    def random_seed(self) -> int:
+        # Of selection, mutation and the optimizers. Not part of cache_context, the fitness does not depend on it
+        return derive_seed(self.seed, "replicate", self.replicate)
+
+    def aggregate(self, fitnesses: list[float]) -> float:
+        # fitnesses[i] is the fitness on terrains[i], robots with skipped terrains are not aggregated
+        if self.aggregation == "min":
+            return min(fitnesses)
+        if self.aggregation == "mean":
+            return sum(fitnesses) / len(fitnesses)
+        return sum(w * f for w, f in zip(self.weights, fitnesses)) / sum(self.weights)
+
+    def spec_dict(self) -> dict:
+        # Settings the fitness of a robot depends on, stored with the results so they can be reused (see WarmStart)
+        spec_dict = {"evaluation steps": self.eval_steps,
+                     "terrain": self.terrain,
+                     "simulator version": config.SIMULATOR_VERSION}
+        if self.terrains is not None:
+            spec_dict["terrains"] = self.terrains
+            spec_dict["aggregation"] = self.aggregation
+            spec_dict["terrain weights"] = self.weights
+            spec_dict["skip below"] = self.skip_below
+        return spec_dict
+
+    def cache_context(self) -> tuple:
+        # Everything that changes the fitness of a genome, used in fitness cache keys
+        if self.terrains is None:
+            return self.build_path, self.seed, self.eval_steps
+        return tuple(self.build_paths), self.aggregation, tuple(self.weights), self.skip_below, self.seed, \
+            self.eval_steps
@@ -0,0 +1,122 @@
+import json
+import hashlib
+from threading import Thread, Lock
+import queue
+
+from evolutionary_algorithms.only_controller import EA
+from evaluation.evaluator import Evaluator
+from evaluation.evaluator_pool import EvaluatorPool
+from controllers.coupled_oscillator import CoupledOscillator
+from evolutionary_algorithms.tournament_remove import TournamentRemove
+from evolve import save_results
+from run_config import RunConfig
+from storage.results_store import ResultsStore
+import config
+
+
+class Job:
+    def __init__(self, ea_class: type[EA], parameters: dict, terrain: str, replicate: int, pop_size: int,
+                 generations: int, elitism: int = 0, eval_steps: int = config.EVALUATION_STEPS):
+        self.ea_class = ea_class
+        self.parameters = parameters  # Keyword arguments of ea_class, the evaluator pool is shared
+        self.terrain = terrain
+        self.replicate = replicate
+        self.pop_size = pop_size
+        self.generations = generations
+        self.elitism = elitism
+        self.eval_steps = eval_steps
+
+    def experiment_key(self) -> str:
+        # Same for every replicate of the same EA, parameters and terrain
+        parameters = {k: getattr(v, "__qualname__", v) for k, v in sorted(self.parameters.items())}
+        description = json.dumps([self.ea_class.__name__, parameters, self.terrain, self.pop_size,
+                                  self.generations, self.elitism, self.eval_steps], default=str)
+        return hashlib.sha1(description.encode()).hexdigest()[:12]
+
+
+class Scheduler:
+    def __init__(self, jobs: list[Job], parallel_processes: int, concurrent_jobs: int = 2,
+                 no_graphics: bool = True, store: ResultsStore = None):
+        self.jobs = jobs
+        self.concurrent_jobs = concurrent_jobs
+        self.pool = EvaluatorPool(parallel_processes, no_graphics=no_graphics)
+        self.store = store if store is not None else ResultsStore()
+        self.runs = {}  # experiment key -> (run_nr, folder)
+        self.lock = Lock()
+
+    def pending_jobs(self) -> list[Job]:
+        return [job for job in self.jobs
+                if len(self.store.query(experiment=job.experiment_key(), replicate=job.replicate)) == 0]
+
+    def run_folder(self, job: Job, spec: dict) -> tuple[int, str]:
+        # Replicates of the same experiment are saved in the same run folder, also across restarts
+        key = job.experiment_key()
+        with self.lock:
+            if key not in self.runs:
+                existing = self.store.query(experiment=key)
+                if len(existing) > 0:
+                    run_nr = existing[0]["run"]
+                    self.runs[key] = (run_nr, f"{self.store.results_path}/run{run_nr}")
+                else:
+                    run_nr, folder = self.store.register_run()
+                    with open(f"{folder}/specs.json", "w") as file:
+                        json.dump(spec, file)
+                    self.runs[key] = (run_nr, folder)
+            return self.runs[key]
+
+    def run_job(self, job: Job):
+        ea = job.ea_class(**job.parameters)
+        ea.use_pool(self.pool)
+        ea.run_config = RunConfig(terrain=job.terrain, eval_steps=job.eval_steps, replicate=job.replicate)
+        ea.run(job.pop_size, job.generations, job.elitism, close_envs=False)
+        if ea.interrupted:
+            return
+        spec = ea.spec_dict()
+        run_nr, folder = self.run_folder(job, spec)
+        save_results(ea, f"{folder}/{job.replicate}")
+        self.store.add_replicate(run_nr, f"{folder}/{job.replicate}", spec, job.replicate, job.terrain,
+                                 experiment=job.experiment_key())
+
+    def _work(self, job_queue: queue.Queue):
+        while not self.pool.interrupted:
+            try:
+                job = job_queue.get_nowait()
+            except queue.Empty:
+                return
+            self.run_job(job)
+
+    def run(self, close_envs: bool = True):
+        # Runs several jobs at once so the evaluators are also busy while a run is selecting and mutating
+        jobs = self.pending_jobs()
+        print(f"{len(self.jobs) - len(jobs)} jobs already have results, {len(jobs)} left")
+        job_queue = queue.Queue()
+        for job in jobs:
+            job_queue.put(job)
+
+        threads = []
+        try:
+            for _ in range(min(self.concurrent_jobs, len(jobs))):
+                thread = Thread(target=self._work, args=(job_queue,))
+                threads.append(thread)
+                thread.start()
+            for t in threads:
+                t.join()
+        except KeyboardInterrupt:
+            print("\nScheduler interrupted, wait for the running generations to terminate.")
+            self.pool.interrupted = True
+            for t in threads:
+                t.join()
+        if close_envs:
+            self.pool.close()
+
+
+if __name__ == "__main__":
+    parameters = {"evaluation_func": Evaluator.evaluate,
+                  "controller_class": CoupledOscillator,
+                  "controller_mutation_sigma": 0.2,
+                  "create_simple": True,
+                  "tournament_size": 2}
+    jobs = [Job(TournamentRemove, dict(parameters, protection=protection), terrain, replicate,
+                pop_size=100, generations=500, elitism=1)
+            for protection in (True, False) for terrain in ("flat", "stairs") for replicate in range(10)]
+    Scheduler(jobs, parallel_processes=64, concurrent_jobs=4).run()
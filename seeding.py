@@ -0,0 +1,16 @@
+import random
+import hashlib
+import numpy as np
+
+
+def derive_seed(*parts) -> int:
+    # Stable across processes and python versions, unlike hash()
+    return int.from_bytes(hashlib.sha256(repr(parts).encode()).digest()[:4], "little")
+
+
+def seed_random(*parts):
+    # Seeds the global random and np.random used by selection and mutation
+    seed = derive_seed(*parts)
+    random.seed(seed)
+    np.random.seed(seed)
+
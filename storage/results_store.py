@@ -0,0 +1,191 @@
+import os
+import json
+import fcntl
+import pickle
+from contextlib import contextmanager
+from datetime import date
+import numpy as np
+
+import config
+from robot.genome_codec import load_individuals
+
+LOGBOOK_COLUMNS = ["avg", "std", "min", "q1", "median", "q3", "max", "avg_age", "modules", "std_modules", "time"]
+GENOME_FILES = ["hall_of_fame", "best_of_each_gen", "last_generation", "lineage", "elites"]
+
+
+@contextmanager
+def locked(path: str):
+    # Exclusive lock shared by every process using the same results folder (e.g. several cluster jobs)
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def read_last_line(path: str) -> str:
+    # Only reads the end of the file instead of the whole run history
+    with open(path, "rb") as file:
+        file.seek(0, os.SEEK_END)
+        position = file.tell()
+        buffer = b""
+        while position > 0:
+            step = min(1024, position)
+            position -= step
+            file.seek(position)
+            buffer = file.read(step) + buffer
+            lines = buffer.strip().splitlines()
+            if len(lines) > 1 or (position == 0 and len(lines) == 1):
+                return lines[-1].decode()
+    return ""
+
+
+def write_generation_arrays(ea, folder: str):
+    # Generation level data as .npy files which can be memory-mapped without unpickling anything
+    array_folder = f"{folder}/arrays"
+    os.makedirs(array_folder, exist_ok=True)
+    for column in LOGBOOK_COLUMNS:
+        values = [record.get(column, np.nan) for record in ea.logbook]
+        np.save(f"{array_folder}/{column}.npy", np.asarray(values, dtype=np.float64))
+
+    # NB: When using pareto-add the population size can vary, so fitnesses are padded with nan
+    width = max((len(f) for f in ea.fitnesses_of_each_gen), default=0)
+    fitnesses = np.full((len(ea.fitnesses_of_each_gen), width), np.nan)
+    for gen, gen_fitnesses in enumerate(ea.fitnesses_of_each_gen):
+        fitnesses[gen, :len(gen_fitnesses)] = gen_fitnesses
+    np.save(f"{array_folder}/fitnesses.npy", fitnesses)
+
+    top20 = np.full((len(ea.fitness_and_ages_of_top20_per_gen), 20, 2), np.nan)
+    for gen, fitness_ages in enumerate(ea.fitness_and_ages_of_top20_per_gen):
+        if len(fitness_ages) > 0:
+            top20[gen, :len(fitness_ages)] = fitness_ages
+    np.save(f"{array_folder}/top20_fitness_age.npy", top20)
+
+    # Fitness on every terrain of multi-terrain runs, generations x population x terrains
+    terrain_fitnesses_of_each_gen = getattr(ea, "terrain_fitnesses_of_each_gen", [])
+    if len(terrain_fitnesses_of_each_gen) > 0:
+        width = max(len(f) for f in terrain_fitnesses_of_each_gen)
+        n_terrains = len(ea.run_config.terrains)
+        terrain_fitnesses = np.full((len(terrain_fitnesses_of_each_gen), width, n_terrains), np.nan)
+        for gen, gen_fitnesses in enumerate(terrain_fitnesses_of_each_gen):
+            if len(gen_fitnesses) > 0:
+                terrain_fitnesses[gen, :len(gen_fitnesses)] = gen_fitnesses
+        np.save(f"{array_folder}/terrain_fitnesses.npy", terrain_fitnesses)
+
+
+class ResultsStore:
+    def __init__(self, results_path: str = config.RESULTS_PATH):
+        self.results_path = results_path
+        self.runs_path = f"{results_path}/runs.csv"
+        self.index_path = f"{results_path}/index.jsonl"
+        self.lock_path = f"{results_path}/.lock"
+        self._index = None
+        self._index_size = 0
+
+    def next_run_nr(self) -> int:
+        if not os.path.exists(self.runs_path):
+            return 1
+        last_line = read_last_line(self.runs_path)
+        if last_line == "":
+            return 1
+        return int(last_line.split(",")[0]) + 1
+
+    def register_run(self, run_nr: int = None) -> tuple[int, str]:
+        # Atomically claims the next run number (unless given) and creates its folder
+        os.makedirs(self.results_path, exist_ok=True)
+        with locked(self.lock_path):
+            if run_nr is not None:
+                folder = f"{self.results_path}/run{run_nr}"
+                os.makedirs(folder, exist_ok=True)
+            else:
+                run_nr = self.next_run_nr()
+                while True:
+                    folder = f"{self.results_path}/run{run_nr}"
+                    try:
+                        os.makedirs(folder)
+                        break
+                    except FileExistsError:  # Folder made by a run that is not in runs.csv
+                        run_nr += 1
+            with open(self.runs_path, "a") as file:
+                file.write(f"{run_nr}, {date.today().strftime('%d/%m/%y')}\n")
+        return run_nr, folder
+
+    def add_replicate(self, run_nr: int, folder: str, spec: dict, replicate: int = 0, terrain: str = None,
+                      experiment: str = None):
+        entry = {"run": run_nr,
+                 "replicate": replicate,
+                 "terrain": terrain,
+                 "experiment": experiment,
+                 "folder": os.path.relpath(folder, self.results_path),
+                 "spec": spec}
+        with locked(self.lock_path):
+            with open(self.index_path, "a") as file:
+                file.write(json.dumps(entry) + "\n")
+
+    def index(self) -> list[dict]:
+        # Only the new part of the index is read if it has grown since the last call
+        if self._index is None:
+            self._index = []
+            self._index_size = 0
+        if os.path.exists(self.index_path) and os.path.getsize(self.index_path) > self._index_size:
+            with open(self.index_path) as file:
+                file.seek(self._index_size)
+                for line in file:
+                    if line.strip():
+                        self._index.append(json.loads(line))
+                self._index_size = file.tell()
+        return self._index
+
+    def query(self, spec: dict = None, **fields) -> list[dict]:
+        # E.g. query(terrain="stairs", spec={"evolution": "tournament-remove protection"})
+        spec = {} if spec is None else spec
+        return [entry for entry in self.index()
+                if all(entry.get(key) == value for key, value in fields.items())
+                and all(entry["spec"].get(key) == value for key, value in spec.items())]
+
+    def folder(self, entry: dict) -> str:
+        return f"{self.results_path}/{entry['folder']}"
+
+    def array(self, entry: dict, name: str) -> np.ndarray:
+        return np.load(f"{self.folder(entry)}/arrays/{name}.npy", mmap_mode="r")
+
+    def stack(self, entries: list[dict], name: str) -> np.ndarray:
+        # One row per run, shorter (e.g. interrupted) runs are padded with nan
+        arrays = [self.array(entry, name) for entry in entries]
+        if len(arrays) == 0:
+            return np.empty(0)
+        length = max(len(a) for a in arrays)
+        stacked = np.full((len(arrays), length) + arrays[0].shape[1:], np.nan)
+        for i, a in enumerate(arrays):
+            stacked[i, :len(a)] = a
+        return stacked
+
+    def load_genomes(self, entry: dict, name: str = "hall_of_fame") -> list:
+        # Genomes are only loaded when explicitly requested
+        if name not in GENOME_FILES:
+            raise ValueError(f"Unknown genome file {name}, expected one of {GENOME_FILES}")
+        return load_individuals(self.folder(entry), name)
+
+    def import_existing(self, run_nr: int, terrain: str = None):
+        # Indexes and builds arrays for a run saved before the results store existed
+        run_folder = f"{self.results_path}/run{run_nr}"
+        with open(f"{run_folder}/specs.json") as file:
+            spec = json.load(file)
+        replicate_folders = sorted((int(f), f"{run_folder}/{f}") for f in os.listdir(run_folder) if f.isdigit())
+        if len(replicate_folders) == 0:
+            replicate_folders = [(0, run_folder)]
+        for replicate, folder in replicate_folders:
+            write_generation_arrays(_PickledResults(folder), folder)
+            self.add_replicate(run_nr, folder, spec, replicate, terrain)
+
+
+class _PickledResults:
+    # Same attributes as an EA, read from the pickles written by save_results
+    def __init__(self, folder: str):
+        with open(f"{folder}/logbook.pickle", "rb") as file:
+            self.logbook = pickle.load(file)
+        with open(f"{folder}/fitnesses_of_each_gen.pickle", "rb") as file:
+            self.fitnesses_of_each_gen = pickle.load(file)
+        with open(f"{folder}/top20_fitness_age.pickle", "rb") as file:
+            self.fitness_and_ages_of_top20_per_gen = pickle.load(file)
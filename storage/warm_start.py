@@ -0,0 +1,67 @@
+import os
+import json
+
+from robot.individual import Individual
+from robot.genome_codec import load_individuals, genome_key
+from storage.results_store import ResultsStore
+
+
+def load_spec(folder: str) -> dict:
+    # Replicates of evolve_n_times share the specs.json of their run folder
+    for path in (f"{folder}/specs.json", f"{os.path.dirname(folder.rstrip('/'))}/specs.json"):
+        if os.path.exists(path):
+            with open(path) as file:
+                return json.load(file)
+    return {}
+
+
+class WarmStart:
+    # Seeds the first population of a run (ea.warm_start) with the best individuals saved by earlier runs,
+    # archived_fraction of the population, the rest is created as usual. Stored fitnesses are kept if the earlier
+    # run had the same fitness settings (RunConfig.spec_dict: terrain, evaluation steps, simulator version, ...),
+    # only the other archived individuals and the new ones are simulated
+    def __init__(self, folders: list[str], archived_fraction: float = 1.0,
+                 files: tuple = ("last_generation", "hall_of_fame")):
+        self.folders = list(folders)
+        self.archived_fraction = archived_fraction
+        self.files = files
+        self.reused = 0  # Of the last population
+        self.reevaluated = 0
+
+    @staticmethod
+    def from_store(store: ResultsStore = None, archived_fraction: float = 1.0,
+                   files: tuple = ("last_generation", "hall_of_fame"), spec: dict = None, **fields):
+        # From every indexed run matching the query, e.g. from_store(terrain="flat", spec={"evolution": ...})
+        store = store if store is not None else ResultsStore()
+        return WarmStart([store.folder(entry) for entry in store.query(spec, **fields)], archived_fraction, files)
+
+    def spec_dict(self) -> dict:
+        return {"warm start": self.folders, "archived fraction": self.archived_fraction,
+                "reused fitnesses": self.reused}
+
+    def load(self, fitness_spec: dict) -> list[tuple[Individual, bool]]:
+        # Archived individuals without duplicates, best stored fitness first, and whether the fitness can be reused
+        candidates = {}
+        for folder in self.folders:
+            spec = load_spec(folder)
+            reusable = all(spec.get(key) == value for key, value in fitness_spec.items())
+            for name in self.files:
+                if not any(os.path.exists(f"{folder}/{name}.{extension}") for extension in ("genomes", "pickle")):
+                    continue
+                for ind in load_individuals(folder, name):
+                    key = genome_key(ind)
+                    if key not in candidates or (reusable and not candidates[key][1]):
+                        candidates[key] = (ind, reusable)
+        return sorted(candidates.values(), key=lambda candidate: candidate[0].fitness, reverse=True)
+
+    def population(self, ea, population_size: int) -> tuple[list[Individual], list[Individual]]:
+        # The first population and the individuals of it that have to be evaluated
+        n_archived = min(int(round(self.archived_fraction * population_size)), population_size)
+        archived = self.load(ea.run_config.spec_dict())[:n_archived]
+        new = ea.toolbox.population(n=population_size - len(archived)) if len(archived) < population_size else []
+        reevaluated = [ind for ind, reusable in archived if not reusable]
+        self.reevaluated = len(reevaluated)
+        self.reused = len(archived) - self.reevaluated
+        print(f"[Warm start]: {len(archived)} archived individuals, {self.reused} with reused fitness, "
+              f"{self.reevaluated} re-evaluated, {len(new)} new")
+        return [ind for ind, _ in archived] + new, reevaluated + new
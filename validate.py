@@ -0,0 +1,127 @@
+import os
+import csv
+import argparse
+from copy import deepcopy
+from threading import Lock
+import numpy as np
+
+from evaluation.evaluator import Evaluator, get_unity_build_path
+from evaluation.evaluator_pool import EvaluatorPool
+from robot.genome_codec import load_individuals
+import config
+
+REPORT_FIELDS = ["folder", "index", "terrain", "seed", "eval_steps", "old_fitness", "new_fitness"]
+SUMMARY_FIELDS = ["folder", "index", "terrain", "eval_steps", "old_fitness", "mean", "std", "var", "n"]
+
+
+def load_elites(folder: str, top_n: int = 1) -> list:
+    # The best first, from the top-k elite archive if the run kept one, the hall of fame only has the best robot
+    name = "elites" if os.path.exists(f"{folder}/elites.genomes") else "hall_of_fame"
+    elites = load_individuals(folder, name)[:top_n]
+    if len(elites) < top_n:
+        print(f"Warning: {folder} only has {len(elites)} of the top {top_n} elites in {name}, "
+              f"keep more with ea.elite_archive = EliteArchive(k)")
+    return elites
+
+
+def read_report(report_path: str) -> list[dict]:
+    if not os.path.exists(report_path):
+        return []
+    with open(report_path, newline="") as file:
+        return list(csv.DictReader(file))
+
+
+def task_key(folder: str, index: int, terrain: str, seed: int, eval_steps: int) -> tuple:
+    return folder, str(index), terrain, str(seed), str(eval_steps)
+
+
+def re_evaluate(folders: list[str], terrains: list[str], seeds: list[int], eval_steps: int,
+                report_folder: str, parallel_processes: int = 1, top_n: int = 1):
+    # Re-simulates the elites of every folder on every terrain and seed, finished evaluations are skipped
+    os.makedirs(report_folder, exist_ok=True)
+    report_path = f"{report_folder}/validation.csv"
+    done = {task_key(r["folder"], r["index"], r["terrain"], r["seed"], r["eval_steps"])
+            for r in read_report(report_path)}
+
+    tasks = []
+    for folder in sorted(folders):
+        for index, ind in enumerate(load_elites(folder, top_n)):
+            for terrain in terrains:
+                for seed in seeds:
+                    if task_key(folder, index, terrain, seed, eval_steps) not in done:
+                        tasks.append((folder, index, terrain, seed, ind))
+    # Unity is launched per terrain and seed, so every env runs all of its elites in a row
+    tasks.sort(key=lambda task: (terrains.index(task[2]), seeds.index(task[3])))
+    print(f"{len(done)} evaluations already done, {len(tasks)} left")
+
+    write_header = not os.path.exists(report_path)
+    lock = Lock()
+    with open(report_path, "a", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=REPORT_FIELDS)
+        if write_header:
+            writer.writeheader()
+
+        def evaluate_task(evaluator: Evaluator, task: tuple):
+            folder, index, terrain, seed, ind = task
+            old_fitness = ind.fitness
+            ind = deepcopy(ind)  # The same elite is simulated concurrently on other terrains and seeds
+            fitness = evaluator.evaluate(ind, eval_steps=eval_steps)
+            with lock:  # Rows are written as soon as they are done so an interrupted job can be resumed
+                writer.writerow({"folder": folder, "index": index, "terrain": terrain, "seed": seed,
+                                 "eval_steps": eval_steps, "old_fitness": old_fitness, "new_fitness": fitness})
+                file.flush()
+            return fitness
+
+        pool = EvaluatorPool(parallel_processes, no_graphics=True)
+        settings = [(get_unity_build_path(terrain), seed) for _, _, terrain, seed, _ in tasks]
+        pool.map(evaluate_task, tasks, settings, desc="Re-evaluating")
+        pool.close()
+
+    write_summary(report_folder, folders, terrains, seeds, eval_steps, top_n)
+
+
+def write_summary(report_folder: str, folders: list[str], terrains: list[str], seeds: list[int],
+                  eval_steps: int, top_n: int = 1):
+    # Mean and variance over seeds, and an array of shape (folders, elites, terrains, seeds) of new fitnesses
+    folders = sorted(folders)
+    rows = [r for r in read_report(f"{report_folder}/validation.csv") if r["eval_steps"] == str(eval_steps)]
+    fitnesses = np.full((len(folders), top_n, len(terrains), len(seeds)), np.nan)
+    old_fitnesses = np.full((len(folders), top_n), np.nan)
+    for r in rows:
+        if r["folder"] not in folders or r["terrain"] not in terrains or int(r["seed"]) not in seeds:
+            continue
+        index = int(r["index"])
+        if index >= top_n:
+            continue
+        f, t, s = folders.index(r["folder"]), terrains.index(r["terrain"]), seeds.index(int(r["seed"]))
+        fitnesses[f, index, t, s] = float(r["new_fitness"])
+        old_fitnesses[f, index] = float(r["old_fitness"])
+    np.save(f"{report_folder}/validation.npy", fitnesses)
+
+    with open(f"{report_folder}/summary.csv", "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        for f, folder in enumerate(folders):
+            for index in range(top_n):
+                for t, terrain in enumerate(terrains):
+                    values = fitnesses[f, index, t]
+                    values = values[~np.isnan(values)]
+                    if len(values) == 0:
+                        continue
+                    writer.writerow({"folder": folder, "index": index, "terrain": terrain, "eval_steps": eval_steps,
+                                     "old_fitness": old_fitnesses[f, index], "mean": np.mean(values),
+                                     "std": np.std(values), "var": np.var(values), "n": len(values)})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-evaluate archived elites headlessly on several terrains and seeds")
+    parser.add_argument("folders", nargs="+")
+    parser.add_argument("--terrains", nargs="+", default=["flat"])
+    parser.add_argument("--seeds", nargs="+", type=int, default=[config.SEED])
+    parser.add_argument("--eval-steps", type=int, default=config.EVALUATION_STEPS)
+    parser.add_argument("--report", default=f"{config.RESULTS_PATH}/validation")
+    parser.add_argument("--parallel-processes", type=int, default=1)
+    parser.add_argument("--top-n", type=int, default=1)
+    args = parser.parse_args()
+    re_evaluate(args.folders, args.terrains, args.seeds, args.eval_steps, args.report,
+                args.parallel_processes, args.top_n)